@@ -3,3 +3,4 @@ from .quote import router as quote_router
 from .music_dataset import router as music_dataset_router
 from .image import router as image_router
 from .expression_analysis import router as expression_analysis_router
+from .live_emotion import router as live_emotion_router
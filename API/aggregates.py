@@ -0,0 +1,166 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import ExpressionAnalysis, UserMoodCount, MoodRollup
+
+# Kolom counter per mood di tabel user_mood_counts
+MOOD_COUNT_COLUMNS = {
+    "Happy": "HappyCount",
+    "Sad": "SadCount",
+    "Fear": "FearCount",
+    "Disgust": "DisgustCount",
+    "Angry": "AngryCount",
+    "Surprise": "SurpriseCount",
+    "Neutral": "NeutralCount",
+}
+
+# Kolom skor ExpressionAnalysis per mood; rollup menyimpan jumlahnya di kolom <Skor>Sum
+SCORE_COLUMNS = {
+    "Sad": "SadScore",
+    "Angry": "AngryScore",
+    "Happy": "HappyScore",
+    "Disgust": "DisgustScore",
+    "Fear": "FearScore",
+    "Surprise": "SurpriseScore",
+    "Neutral": "NeutralScore",
+}
+
+ROLLUP_PERIODS = ("day", "week")
+
+def analysis_created_at():
+    """CreatedAt untuk row ExpressionAnalysis baru: waktu sekarang tanpa mikrodetik.
+
+    Kolom TIMESTAMP tanpa presisi pecahan membulatkan mikrodetik (MySQL), sehingga 23:59:59.6
+    tersimpan sebagai hari berikutnya sementara rollup sudah menghitungnya di hari sebelumnya.
+    """
+    return datetime.now().replace(microsecond=0)
+
+def count_moods(db: Session, user_id):
+    """Hitung mood langsung dari expression_analysis (GROUP BY). Dipakai untuk backfill dan verifikasi."""
+    rows = db.query(ExpressionAnalysis.MoodDetected, func.count().label('total')) \
+        .filter(ExpressionAnalysis.UserID == user_id) \
+        .group_by(ExpressionAnalysis.MoodDetected).all()
+    return {mood: total for mood, total in rows if mood in MOOD_COUNT_COLUMNS}
+
+def mood_counts_to_dict(counter: UserMoodCount):
+    mood_count_dict = {
+        mood: (getattr(counter, column) or 0) if counter is not None else 0
+        for mood, column in MOOD_COUNT_COLUMNS.items()
+    }
+    mood_count_dict["Total"] = sum(mood_count_dict.values())
+    return mood_count_dict
+
+def backfill_mood_counts(db: Session, user_id):
+    """Buat row counter dari riwayat yang ada. Jika row sudah dibuat transaksi lain, kembalikan False."""
+    counts = count_moods(db, user_id)
+    try:
+        with db.begin_nested():
+            db.add(UserMoodCount(
+                UserID=user_id,
+                **{column: counts.get(mood, 0) for mood, column in MOOD_COUNT_COLUMNS.items()}
+            ))
+    except IntegrityError:
+        return False
+    return True
+
+def increment_mood_counts(db: Session, user_id, moods: Counter):
+    """Tambah counter mood user di transaksi yang sama dengan insert ExpressionAnalysis-nya.
+
+    Row analisis baru harus sudah di-flush: jika user belum punya row counter, row dibuat dari
+    GROUP BY atas seluruh riwayat (termasuk row baru tersebut).
+    """
+    values = {
+        getattr(UserMoodCount, MOOD_COUNT_COLUMNS[mood]): getattr(UserMoodCount, MOOD_COUNT_COLUMNS[mood]) + count
+        for mood, count in moods.items() if mood in MOOD_COUNT_COLUMNS
+    }
+    if not values:
+        return
+    query = db.query(UserMoodCount).filter(UserMoodCount.UserID == user_id)
+    if query.update(values, synchronize_session=False):
+        return
+    if not backfill_mood_counts(db, user_id):
+        query.update(values, synchronize_session=False)
+
+def bucket_start(created_at: datetime, period: str):
+    """Awal bucket rollup: tanggal itu sendiri (day) atau hari Senin minggu tersebut (week)."""
+    day = created_at.date()
+    return day if period == "day" else day - timedelta(days=day.weekday())
+
+def bucket_end(start, period: str):
+    return start + timedelta(days=1 if period == "day" else 7)
+
+def empty_rollup_values():
+    values = {"AnalysisCount": 0}
+    values.update({f"{column}Sum": 0.0 for column in SCORE_COLUMNS.values()})
+    values.update({column: 0 for column in MOOD_COUNT_COLUMNS.values()})
+    return values
+
+def add_to_rollup(values, analysis):
+    values["AnalysisCount"] += 1
+    for column in SCORE_COLUMNS.values():
+        values[f"{column}Sum"] += analysis[column] or 0.0
+    if analysis["MoodDetected"] in MOOD_COUNT_COLUMNS:
+        values[MOOD_COUNT_COLUMNS[analysis["MoodDetected"]]] += 1
+
+def rollup_from_rows(db: Session, user_id, period: str, start):
+    """Hitung satu bucket rollup langsung dari expression_analysis (untuk seed dan verifikasi)."""
+    rows = db.query(
+        ExpressionAnalysis.MoodDetected,
+        func.count(),
+        *[func.sum(getattr(ExpressionAnalysis, column)) for column in SCORE_COLUMNS.values()]
+    ).filter(
+        ExpressionAnalysis.UserID == user_id,
+        ExpressionAnalysis.CreatedAt >= datetime.combine(start, datetime.min.time()),
+        ExpressionAnalysis.CreatedAt < datetime.combine(bucket_end(start, period), datetime.min.time()),
+    ).group_by(ExpressionAnalysis.MoodDetected).all()
+
+    values = empty_rollup_values()
+    for mood, total, *sums in rows:
+        values["AnalysisCount"] += total
+        for column, score_sum in zip(SCORE_COLUMNS.values(), sums):
+            values[f"{column}Sum"] += score_sum or 0.0
+        if mood in MOOD_COUNT_COLUMNS:
+            values[MOOD_COUNT_COLUMNS[mood]] += total
+    return values
+
+def increment_rollup(db: Session, user_id, period: str, start, values):
+    """Tambahkan nilai ke satu bucket rollup; bucket yang belum ada di-seed dari row mentahnya."""
+    query = db.query(MoodRollup).filter(
+        MoodRollup.UserID == user_id,
+        MoodRollup.Period == period,
+        MoodRollup.BucketStart == start,
+    )
+    update = {getattr(MoodRollup, key): getattr(MoodRollup, key) + value for key, value in values.items() if value}
+    if query.update(update, synchronize_session=False):
+        return
+    try:
+        with db.begin_nested():
+            db.add(MoodRollup(UserID=user_id, Period=period, BucketStart=start, **rollup_from_rows(db, user_id, period, start)))
+    except IntegrityError:
+        query.update(update, synchronize_session=False)
+
+ANALYSIS_FIELDS = ["UserID", "MoodDetected", "CreatedAt", *SCORE_COLUMNS.values()]
+
+def apply_new_analyses(db: Session, analyses):
+    """Perbarui semua agregat (counter mood dan rollup tren) untuk analisis yang baru di-insert.
+
+    Dipanggil setelah row di-flush dan sebelum commit, sehingga agregat ikut transaksi yang sama.
+    analyses: row ExpressionAnalysis atau dict dengan kolom yang sama.
+    """
+    moods_by_user = defaultdict(Counter)
+    rollups = defaultdict(empty_rollup_values)
+    for analysis in analyses:
+        if not isinstance(analysis, dict):
+            analysis = {field: getattr(analysis, field) for field in ANALYSIS_FIELDS}
+        user_id = int(analysis["UserID"])
+        moods_by_user[user_id][analysis["MoodDetected"]] += 1
+        created_at = analysis.get("CreatedAt") or datetime.now()
+        for period in ROLLUP_PERIODS:
+            add_to_rollup(rollups[(user_id, period, bucket_start(created_at, period))], analysis)
+
+    for user_id, moods in moods_by_user.items():
+        increment_mood_counts(db, user_id, moods)
+    for (user_id, period, start), values in rollups.items():
+        increment_rollup(db, user_id, period, start, values)
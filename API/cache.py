@@ -0,0 +1,331 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Cache in-memory dengan batas jumlah entry (LRU) dan TTL opsional. Thread-safe."""
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def delete_where(self, predicate):
+        """Hapus semua entry yang key-nya memenuhi predicate, misalnya semua milik satu user."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SQLiteCache:
+    """Cache persisten di file SQLite lokal untuk nilai yang bisa di-serialize ke JSON."""
+
+    def __init__(self, path, max_entries=10000, ttl=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_created ON cache (created)")
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created = row
+        if self.ttl and created + self.ttl <= time.time():
+            self.delete(key)
+            return None
+        return json.loads(value)
+
+    def set(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
+            # Buang entry tertua jika melebihi batas
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def get_many(self, keys):
+        """Nilai untuk banyak key sekaligus; key yang tidak ada atau kedaluwarsa tidak dikembalikan."""
+        keys = list(keys)
+        oldest = time.time() - self.ttl if self.ttl else None
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):  # Batas jumlah parameter SQLite
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value, created FROM cache WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, value, created in rows:
+                    if oldest is None or created > oldest:
+                        found[key] = json.loads(value)
+        return found
+
+    def set_many(self, items):
+        """Simpan banyak entry dalam satu transaksi."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+                [(key, json.dumps(value), now) for key, value in items.items()],
+            )
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+def log_write_error(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Cache write-back failed", exc_info=future.exception())
+
+
+class TieredCache:
+    """Cache dua tingkat: LRU in-memory di depan, SQLite opsional di belakang (bertahan setelah restart)."""
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    async def get_async(self, key):
+        """Seperti get, tetapi query SQLite dijalankan di thread executor; hanya LRU yang dicek di event loop."""
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+        if self.disk is not None:
+            value = await asyncio.get_running_loop().run_in_executor(None, self.disk.get, key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def set_async(self, key, value):
+        """Seperti set dari event loop: LRU langsung diisi, tulis ke SQLite (dengan commit) di executor tanpa ditunggu."""
+        self.memory.set(key, value)
+        if self.disk is not None:
+            future = asyncio.get_running_loop().run_in_executor(None, self.disk.set, key, value)
+            future.add_done_callback(log_write_error)
+
+    def delete_prefix(self, prefix):
+        self.memory.delete_where(lambda key: key.startswith(prefix))
+        if self.disk is not None:
+            self.disk.delete_prefix(prefix)
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "hits": self.memory_hits + self.disk_hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "evictions": self.memory.evictions,
+            "disk_entries": len(self.disk) if self.disk is not None else None,
+        }
+
+
+class RedisCache:
+    """Backend cache bersama (Redis) agar beberapa worker melihat data yang sama. Butuh paket redis."""
+
+    def __init__(self, url, prefix, ttl=None):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_REDIS_URL is set but the redis package is not installed")
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self._client.get(f"{self.prefix}{key}")
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self._client.set(f"{self.prefix}{key}", json.dumps(value), ex=int(self.ttl) if self.ttl else None)
+
+    def delete(self, key):
+        return bool(self._client.delete(f"{self.prefix}{key}"))
+
+
+class KeyedCache:
+    """Cache per key dengan LRU lokal, atau backend bersama jika tersedia.
+
+    Dengan backend bersama, hanya backend itu yang dipakai supaya semua worker konsisten
+    (tidak ada salinan lokal yang bisa basi setelah worker lain menulis).
+    """
+
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    def get(self, key):
+        if self.shared is None:
+            return self.local.get(key)
+        value = self.shared.get(key)
+        if value is None:
+            self.shared_misses += 1
+        else:
+            self.shared_hits += 1
+        return value
+
+    def set(self, key, value):
+        (self.shared or self.local).set(key, value)
+
+    def delete(self, key):
+        (self.shared or self.local).delete(key)
+
+    def stats(self):
+        if self.shared is None:
+            return {"backend": "memory", **self.local.stats()}
+        lookups = self.shared_hits + self.shared_misses
+        return {
+            "backend": "redis",
+            "ttl": self.shared.ttl,
+            "hits": self.shared_hits,
+            "misses": self.shared_misses,
+            "hit_ratio": self.shared_hits / lookups if lookups else 0.0,
+            "evictions": None,  # Eviction di Redis diatur oleh TTL dan maxmemory server
+        }
+
+
+# Backend bersama opsional untuk cache yang harus konsisten antar worker
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+# Cache hasil deteksi per (user, hash isi upload) untuk upload ulang dari client
+DEDUPE_CACHE_SIZE = int(os.getenv("DEDUPE_CACHE_SIZE", "1024"))
+DEDUPE_CACHE_TTL = float(os.getenv("DEDUPE_CACHE_TTL", "600"))
+DEDUPE_CACHE_PATH = os.getenv("DEDUPE_CACHE_PATH")  # Opsional, misalnya "images/dedupe-cache.sqlite3"
+
+upload_dedupe_cache = TieredCache(
+    LRUCache(max_entries=DEDUPE_CACHE_SIZE, ttl=DEDUPE_CACHE_TTL),
+    SQLiteCache(DEDUPE_CACHE_PATH, max_entries=DEDUPE_CACHE_SIZE * 10, ttl=DEDUPE_CACHE_TTL) if DEDUPE_CACHE_PATH else None,
+)
+
+def dedupe_key(user_id, digest, multi_face=False):
+    return f"{user_id}:{digest}:{int(multi_face)}"
+
+
+# Cache expression analysis terbaru per user (endpoint /expression_analysis/latest)
+LATEST_CACHE_SIZE = int(os.getenv("LATEST_CACHE_SIZE", "10000"))
+LATEST_CACHE_TTL = float(os.getenv("LATEST_CACHE_TTL", "300"))
+
+latest_expression_cache = KeyedCache(
+    LRUCache(max_entries=LATEST_CACHE_SIZE, ttl=LATEST_CACHE_TTL),
+    RedisCache(CACHE_REDIS_URL, "moodify:latest:", ttl=LATEST_CACHE_TTL) if CACHE_REDIS_URL else None,
+)
@@ -0,0 +1,146 @@
+from sqlalchemy.orm import Session
+from API.serialization import dumps, row_payload
+import hashlib
+import threading
+import time
+
+def row_digest(payload: dict) -> int:
+    """Hash 64-bit dari isi satu row; version catalog adalah XOR semua digest ini."""
+    return int.from_bytes(hashlib.sha1(dumps(payload)).digest()[:8], "big")
+
+def _position(rows, key, value):
+    """Posisi value di list payload yang urut kolom key (binary search)."""
+    low, high = 0, len(rows)
+    while low < high:
+        mid = (low + high) // 2
+        if rows[mid][key] < value:
+            low = mid + 1
+        else:
+            high = mid
+    return low
+
+class Catalog:
+    """Tabel kecil yang disimpan utuh di memori, urut primary key dan diindeks per nilai kolom.
+
+    Subclass mengisi model, key, refresh_interval, _signature_of, dan _groups. version adalah XOR
+    digest per row, jadi sama di semua worker selama datanya sama, dan cukup diperbarui untuk row
+    yang berubah. Index diubah di tempat, jadi apply dipanggil dari thread event loop agar handler
+    tidak pernah melihat update setengah jadi.
+    """
+
+    model = None  # Model SQLAlchemy
+    key = None  # Nama kolom primary key
+    refresh_interval = 60.0  # Interval (detik) pengecekan perubahan dari worker lain
+
+    def __init__(self):
+        self.version = None
+        self.loaded = False
+        self._rows = {}  # key -> payload
+        self._digests = {}  # key -> row_digest(payload)
+        self._checksum = 0  # XOR semua digest
+        self._ordered = []  # Semua payload urut key
+        self._indexes = {}  # nama index -> {nilai -> [payload] urut key}
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _signature_of(self, db: Session):
+        """Ringkasan murah isi tabel di database untuk mendeteksi perubahan dari worker lain."""
+        raise NotImplementedError
+
+    def _groups(self, row: dict):
+        """Pasangan (nama index, nilai) tempat row ini dimasukkan."""
+        return ()
+
+    def load(self, db: Session):
+        """Bangun ulang seluruh index dari database."""
+        rows = {}
+        for row in db.query(self.model).all():
+            payload = row_payload(row)
+            rows[payload[self.key]] = payload
+        signature = self._signature_of(db)
+        ordered = [rows[row_id] for row_id in sorted(rows)]
+        indexes = {}
+        for row in ordered:
+            for name, value in self._groups(row):
+                indexes.setdefault(name, {}).setdefault(value, []).append(row)
+        digests = {row_id: row_digest(row) for row_id, row in rows.items()}
+        checksum = 0
+        for digest in digests.values():
+            checksum ^= digest
+        with self._lock:
+            self._rows = rows
+            self._digests = digests
+            self._checksum = checksum
+            self._ordered = ordered
+            self._indexes = indexes
+            self.version = format(checksum, "016x")
+            self._signature = signature
+            self._checked_at = time.monotonic()
+            self.loaded = True
+
+    def fetch_ids(self, db: Session, row_ids):
+        """Ambil isi terbaru row_ids dan signature tanpa menyentuh index (aman di thread executor).
+
+        Hasilnya diteruskan ke apply.
+        """
+        row_ids = set(row_ids)
+        rows = {}
+        if row_ids:
+            for row in db.query(self.model).filter(getattr(self.model, self.key).in_(row_ids)).all():
+                payload = row_payload(row)
+                rows[payload[self.key]] = payload
+        return row_ids, rows, self._signature_of(db)
+
+    def apply(self, row_ids, rows, signature):
+        """Perbarui index hanya untuk row_ids; ID yang tidak ada di rows dihapus dari catalog."""
+        if not self.loaded or not row_ids:
+            return
+        with self._lock:
+            for row_id in row_ids:
+                old = self._rows.pop(row_id, None)
+                if old is not None:
+                    self._checksum ^= self._digests.pop(row_id)
+                    for rows_list in self._lists_for(old):
+                        i = _position(rows_list, self.key, row_id)
+                        if i < len(rows_list) and rows_list[i][self.key] == row_id:
+                            del rows_list[i]
+                new = rows.get(row_id)
+                if new is not None:
+                    digest = row_digest(new)
+                    self._rows[row_id] = new
+                    self._digests[row_id] = digest
+                    self._checksum ^= digest
+                    for rows_list in self._lists_for(new):
+                        # Row baru (key terbesar) berakhir di ujung list: sama dengan append
+                        rows_list.insert(_position(rows_list, self.key, row_id), new)
+            self.version = format(self._checksum, "016x")
+            self._signature = signature
+            self._checked_at = time.monotonic()
+
+    def _lists_for(self, row):
+        yield self._ordered
+        for name, value in self._groups(row):
+            yield self._indexes.setdefault(name, {}).setdefault(value, [])
+
+    def refresh_ids(self, db: Session, row_ids):
+        """Perbarui catalog setelah commit yang mengubah row_ids."""
+        if not self.loaded:
+            return self.load(db)
+        self.apply(*self.fetch_ids(db, row_ids))
+
+    def ensure_fresh(self, db: Session):
+        """Muat catalog jika belum ada, dan muat ulang jika database diubah worker lain."""
+        if not self.loaded:
+            return self.load(db)
+        if time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+        self._checked_at = time.monotonic()
+        if self._signature_of(db) != self._signature:
+            self.load(db)
+
+    def all_rows(self):
+        return self._ordered
+
+    def rows_for(self, name: str, value):
+        return self._indexes.get(name, {}).get(value, [])
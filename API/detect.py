@@ -1,117 +1,353 @@
 from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from models import Image, ExpressionAnalysis
-from database import get_db
+from database import get_db, SessionLocal
 from API.user import get_current_user  # Fungsi untuk mendapatkan user dari token
-import cv2
+from API.inference import scheduler, executor, warm_up
+from API.face_detection import decode_grayscale, detect_faces, prepare_face
+from API.cache import upload_dedupe_cache, dedupe_key, latest_expression_cache
+from API.serialization import row_payload
+from API.aggregates import apply_new_analyses, analysis_created_at
+from API.persistence import analysis_scores, save_detections, write_behind, PERSIST_MODE
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import List
+import asyncio
+import hashlib
+import json
 import numpy as np
-import tensorflow as tf
 import os
-import shutil
 from uuid import uuid4
 
 os.environ["OMP_NUM_THREADS"] = "1"
 os.environ["TF_NUM_INTRAOP_THREADS"] = "1"
 os.environ["TF_NUM_INTEROP_THREADS"] = "1"
 
-# Load the TensorFlow Lite model and face detector
-interpreter = tf.lite.Interpreter(model_path='./FacialEmotion/200epoch.tflite')
-interpreter.allocate_tensors()
-
-faceDetect = cv2.CascadeClassifier('./FacialEmotion/haarcascade_frontalface_default.xml')
-
 # Directory for saving uploaded images
 UPLOAD_DIR = "images/user-faces"
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
-labels_dict = {0: 'Angry', 1: 'Disgust', 2: 'Fear', 3: 'Happy', 4: 'Neutral', 5: 'Sad', 6: 'Surprise'}
+# Batas jumlah file dan total ukuran (byte) per request endpoint batch; semua isi file dibaca ke memori
+BATCH_DETECT_MAX_FILES = int(os.getenv("BATCH_DETECT_MAX_FILES", "100"))
+BATCH_DETECT_MAX_BYTES = int(os.getenv("BATCH_DETECT_MAX_BYTES", str(64 * 1024 * 1024)))
+# Upload lebih besar dari ini (byte) di-hash di executor; yang kecil lebih cepat di-hash langsung
+HASH_IN_EXECUTOR_MIN_SIZE = 256 * 1024
 
 detect_router = APIRouter()
 
+async def upload_digest(data: bytes) -> str:
+    """SHA-256 isi upload tanpa menahan event loop untuk foto besar (hashlib melepas GIL)."""
+    if len(data) < HASH_IN_EXECUTOR_MIN_SIZE:
+        return hashlib.sha256(data).hexdigest()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, lambda: hashlib.sha256(data).hexdigest())
+
+def save_upload(file_path: str, data: bytes):
+    with open(file_path, "wb") as buffer:
+        buffer.write(data)
+
+def extract_faces(data: bytes, multi_face: bool = False):
+    """Decode gambar, deteksi wajah, lalu siapkan batch tensor (n, 48, 48, 1). Dijalankan di executor.
+
+    Tanpa multi_face hanya wajah pertama yang diproses. Mengembalikan (boxes, batch),
+    atau ([], None) jika tidak ada wajah.
+    """
+    gray = decode_grayscale(data)
+    if gray is None:
+        raise ValueError("Uploaded file is not a valid image")
+    faces = detect_faces(gray)
+    if len(faces) == 0:
+        return [], None
+
+    if not multi_face:
+        faces = faces[:1]
+    boxes = [tuple(int(v) for v in box) for box in faces]
+    batch = np.stack([prepare_face(gray, box) for box in boxes])
+    return boxes, np.reshape(batch, (len(boxes), 48, 48, 1)).astype(np.float32)
+
+def build_analysis(user_id, image_id, emotion_probabilities):
+    """Ubah satu baris probabilitas model menjadi row ExpressionAnalysis (skor dalam persen)."""
+    return ExpressionAnalysis(
+        UserID=user_id,
+        ImageID=image_id,
+        CreatedAt=analysis_created_at(),  # Diisi dari aplikasi agar sama dengan bucket rollup
+        **analysis_scores(emotion_probabilities)
+    )
+
 @detect_router.post("/detect_and_upload", status_code=status.HTTP_201_CREATED)
 async def detect_and_upload(
     image: UploadFile = File(...),
+    multi_face: bool = False,  # Analisis semua wajah di foto, bukan hanya wajah pertama
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)  # Ambil user dari token
 ):
+    saved_file = None  # File asli di disk yang belum dimiliki row database atau antrean write-behind
     try:
         # Extract UserID from the current user
         user_id = current_user.get("sub")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid user authentication")
 
-        # Save the uploaded file to server disk
+        # Upload ulang dengan isi yang sama langsung dijawab dari cache, tanpa inferensi maupun disk
+        data = await image.read()
+        cache_key = dedupe_key(user_id, await upload_digest(data), multi_face)
+        cached = await upload_dedupe_cache.get_async(cache_key)
+        if cached is not None:
+            return {**cached, "duplicate": True}
+
         file_extension = os.path.splitext(image.filename)[1]
         unique_filename = f"{uuid4().hex}{file_extension}"
         file_path = os.path.join(UPLOAD_DIR, unique_filename)
 
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-
-        # Load the image and detect emotions
-        frame = cv2.imread(file_path)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = faceDetect.detectMultiScale(gray, 1.3, 3)
-        if len(faces) == 0:
-            os.remove(file_path)  # Remove the image if no face is detected
+        # Decode dari memori dan deteksi wajah di executor agar tidak memblokir event loop
+        loop = asyncio.get_running_loop()
+        boxes, batch = await loop.run_in_executor(executor, extract_faces, data, multi_face)
+        if batch is None:
             raise HTTPException(status_code=404, detail="No faces detected")
 
-        # Process the first detected face for simplicity
-        (x, y, w, h) = faces[0]
-        sub_face_img = gray[y:y + h, x:x + w]
-        resized = cv2.resize(sub_face_img, (48, 48))
-        normalize = resized / 255.0
-        reshaped = np.reshape(normalize, (1, 48, 48, 1))
+        # Wajah ditemukan: simpan file asli di background sambil menjalankan inferensi
+        save_task = loop.run_in_executor(None, save_upload, file_path, data)
+        saved_file = file_path
+        try:
+            # Use TensorFlow Lite to make predictions (semua wajah dalam satu batch)
+            result = await scheduler.predict(batch)
+        finally:
+            await save_task
 
-        # Use TensorFlow Lite to make predictions
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
+        image_path = f"images/user-faces/{unique_filename}"
 
-        # Set input tensor
-        interpreter.set_tensor(input_details[0]['index'], reshaped.astype(np.float32))
-
-        # Run inference
-        interpreter.invoke()
-
-        # Get the output tensor
-        result = interpreter.get_tensor(output_details[0]['index'])
-        label = int(np.argmax(result, axis=1)[0])
-        emotion_probabilities = result[0]
-        total_probability = np.sum(emotion_probabilities)
-        percentage_probabilities = (emotion_probabilities / total_probability) * 100
+        # Mode write-behind: row disimpan bulk oleh thread background, handler langsung menjawab.
+        # Jika antrean penuh, jatuh kembali ke penyimpanan langsung di bawah.
+        if PERSIST_MODE == "write_behind" and write_behind.submit(user_id, image_path, result):
+            saved_file = None
+            analyses = [{"UserID": user_id, "ImageID": None, **analysis_scores(row)} for row in result]
+            response = {
+                "message": "Image uploaded and emotion detected successfully",
+                "image": {"UserID": user_id, "ImagePath": image_path},
+                "user_id": user_id,
+                "persisted": False
+            }
+            if multi_face:
+                response["message"] = f"Image uploaded and {len(analyses)} faces analysed successfully"
+                response["faces"] = [
+                    {"box": {"x": x, "y": y, "w": w, "h": h}, "analysis": analysis}
+                    for (x, y, w, h), analysis in zip(boxes, analyses)
+                ]
+            else:
+                response["analysis"] = analyses[0]
+            upload_dedupe_cache.set_async(cache_key, response)
+            return response
 
         # Save the image information in the database
         db_image = Image(
             UserID=user_id,
-            ImagePath=f"images/user-faces/{unique_filename}"
+            ImagePath=image_path
         )
+
+        if multi_face:
+            # Satu row ExpressionAnalysis per wajah, disimpan bersama image dalam satu transaksi
+            db.add(db_image)
+            db.flush()
+            analyses = [build_analysis(user_id, db_image.ImageID, row) for row in result]
+            db.add_all(analyses)
+            db.flush()
+            apply_new_analyses(db, analyses)
+            db.commit()
+            saved_file = None
+
+            # Muat ulang semua row hasil insert dengan satu query (bukan refresh per row)
+            analyses = (
+                db.query(ExpressionAnalysis)
+                .filter(ExpressionAnalysis.ImageID == db_image.ImageID)
+                .order_by(ExpressionAnalysis.AnalysisID)
+                .all()
+            )
+            latest_expression_cache.set(str(user_id), row_payload(analyses[-1]))
+
+            response = jsonable_encoder({
+                "message": f"Image uploaded and {len(analyses)} faces analysed successfully",
+                "image": {"UserID": user_id, "ImagePath": db_image.ImagePath},
+                "faces": [
+                    {"box": {"x": x, "y": y, "w": w, "h": h}, "analysis": analysis}
+                    for (x, y, w, h), analysis in zip(boxes, analyses)
+                ],
+                "user_id": user_id
+            })
+            upload_dedupe_cache.set_async(cache_key, response)
+            return response
+
         db.add(db_image)
         db.commit()
         db.refresh(db_image)
 
         # Save emotion analysis in the database
-        analysis = ExpressionAnalysis(
-            UserID=user_id,
-            ImageID=db_image.ImageID,
-            MoodDetected=labels_dict[label],
-            SadScore=float(percentage_probabilities[5]),
-            AngryScore=float(percentage_probabilities[0]),
-            HappyScore=float(percentage_probabilities[3]),
-            DisgustScore=float(percentage_probabilities[1]),
-            FearScore=float(percentage_probabilities[2]),
-            SurpriseScore=float(percentage_probabilities[6]),
-            NeutralScore=float(percentage_probabilities[4]),
-        )
+        analysis = build_analysis(user_id, db_image.ImageID, result[0])
         db.add(analysis)
+        db.flush()
+        apply_new_analyses(db, [analysis])
         db.commit()
+        saved_file = None
         db.refresh(analysis)
+        latest_expression_cache.set(str(user_id), row_payload(analysis))
 
-        return {
+        response = jsonable_encoder({
             "message": "Image uploaded and emotion detected successfully",
             "image": {"UserID": user_id, "ImagePath": db_image.ImagePath},
             "analysis": analysis,
             "user_id": user_id
-        }
+        })
+        upload_dedupe_cache.set_async(cache_key, response)
+        return response
     except Exception as e:
+        # Sama seperti detect_one: inferensi atau commit gagal, file asli yang sudah tersimpan dihapus lagi
+        if saved_file is not None and os.path.exists(saved_file):
+            os.remove(saved_file)
         raise HTTPException(status_code=500, detail=str(e))
+
+async def detect_one(index: int, filename: str, data: bytes, multi_face: bool):
+    """Jalankan pipeline deteksi untuk satu file dari request batch dan simpan file aslinya jika ada wajah."""
+    line = {"index": index, "filename": filename}
+    loop = asyncio.get_running_loop()
+    try:
+        boxes, batch = await loop.run_in_executor(executor, extract_faces, data, multi_face)
+    except ValueError as e:
+        return {**line, "status": "error", "detail": str(e)}, None
+    if batch is None:
+        return {**line, "status": "no_face"}, None
+
+    unique_filename = f"{uuid4().hex}{os.path.splitext(filename)[1]}"
+    file_path = os.path.join(UPLOAD_DIR, unique_filename)
+    save_task = loop.run_in_executor(None, save_upload, file_path, data)
+    try:
+        result = await scheduler.predict(batch)
+    except Exception as e:
+        await save_task
+        os.remove(file_path)
+        return {**line, "status": "error", "detail": str(e)}, None
+    await save_task
+
+    image_path = f"images/user-faces/{unique_filename}"
+    line.update({
+        "status": "ok",
+        "ImagePath": image_path,
+        "faces": [
+            {"box": {"x": x, "y": y, "w": w, "h": h}, **analysis_scores(row)}
+            for (x, y, w, h), row in zip(boxes, result)
+        ],
+    })
+    return line, (image_path, result)
+
+def persist_batch(user_id, detections):
+    # Endpoint streaming memakai session sendiri karena response masih berjalan setelah handler selesai
+    db = SessionLocal()
+    try:
+        return save_detections(db, [(user_id, image_path, result) for image_path, result in detections])
+    except Exception:
+        db.rollback()
+        # File yang sudah tersimpan tidak punya row di database, jadi dihapus lagi
+        for image_path, _ in detections:
+            file_path = os.path.join(UPLOAD_DIR, os.path.basename(image_path))
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        raise
+    finally:
+        db.close()
+
+# Task batch yang sedang berjalan; asyncio hanya menyimpan weak reference ke task
+batch_tasks = set()
+
+async def run_batch(user_id, uploads, multi_face, lines: asyncio.Queue):
+    """Deteksi semua file lalu simpan hasilnya dengan bulk insert, baris hasil dikirim lewat lines.
+
+    Berjalan sebagai task sendiri, jadi hasil tetap tersimpan (dan file tidak yatim) walaupun
+    client memutus stream sebelum selesai. None di lines menandai akhir stream.
+    """
+    loop = asyncio.get_running_loop()
+    tasks = [
+        asyncio.ensure_future(detect_one(index, filename, data, multi_face))
+        for index, (filename, data) in enumerate(uploads)
+    ]
+    detections = []
+    summary = {"status": "done", "images": len(uploads)}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                line, detection = await next_done
+            except Exception as e:
+                line, detection = {"status": "error", "detail": str(e)}, None
+            if detection is not None:
+                detections.append(detection)
+            lines.put_nowait(line)
+
+        # Semua Image dan ExpressionAnalysis disimpan sekaligus dengan bulk insert
+        summary["detected"] = len(detections)
+        try:
+            summary["ImageIDs"] = await loop.run_in_executor(None, persist_batch, user_id, detections)
+        except Exception as e:
+            summary.update({"status": "persist_error", "detail": str(e)})
+    finally:
+        for task in tasks:
+            task.cancel()
+        lines.put_nowait(summary)
+        lines.put_nowait(None)
+
+# Endpoint deteksi banyak gambar sekaligus, hasil dikirim per baris (NDJSON) begitu selesai
+@detect_router.post("/detect_and_upload/batch", status_code=status.HTTP_200_OK)
+async def detect_and_upload_batch(
+    images: List[UploadFile] = File(...),
+    multi_face: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    user_id = current_user.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid user authentication")
+    if len(images) > BATCH_DETECT_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many files. Maximum is {BATCH_DETECT_MAX_FILES} per request"
+        )
+
+    # Baca semua isi file dulu; UploadFile tidak boleh dipakai lagi setelah handler selesai.
+    # Tiap read dibatasi sisa kuota, jadi memori tidak pernah melebihi BATCH_DETECT_MAX_BYTES
+    uploads = []
+    total_bytes = 0
+    for image in images:
+        data = await image.read(BATCH_DETECT_MAX_BYTES - total_bytes + 1)
+        total_bytes += len(data)
+        if total_bytes > BATCH_DETECT_MAX_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Files too large. Maximum total is {BATCH_DETECT_MAX_BYTES} bytes per request"
+            )
+        uploads.append((image.filename, data))
+
+    lines = asyncio.Queue()
+    task = asyncio.ensure_future(run_batch(user_id, uploads, multi_face, lines))
+    batch_tasks.add(task)
+    task.add_done_callback(batch_tasks.discard)
+
+    async def stream():
+        while True:
+            line = await lines.get()
+            if line is None:
+                return
+            yield json.dumps(line) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# Endpoint untuk melihat metrik micro-batching inferensi
+@detect_router.get("/detect/metrics", status_code=status.HTTP_200_OK)
+async def get_detect_metrics(current_user: dict = Depends(get_current_user)):
+    return {
+        "inference": scheduler.metrics(),
+        "dedupe": upload_dedupe_cache.stats(),
+        "write_behind": write_behind.stats()
+    }
+
+# Endpoint untuk memuat model sebelum traffic datang (misalnya setelah deploy)
+@detect_router.post("/detect/warm_up", status_code=status.HTTP_200_OK)
+async def warm_up_model(current_user: dict = Depends(get_current_user)):
+    loop = asyncio.get_running_loop()
+    runtime = await loop.run_in_executor(executor, warm_up)
+    return {"message": "Model loaded", "runtime": runtime}
@@ -1,11 +1,21 @@
-from fastapi import APIRouter, FastAPI, HTTPException, Depends, status
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, status, Request
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Annotated
-from database import get_db
-from models import ExpressionAnalysis
-from sqlalchemy import func, desc
+from database import get_db, SessionLocal
+from models import ExpressionAnalysis, UserMoodCount, MoodRollup, Image
+from fastapi.responses import StreamingResponse
+import csv
+import io
+import json
+from API.aggregates import backfill_mood_counts, mood_counts_to_dict, bucket_start, SCORE_COLUMNS, MOOD_COUNT_COLUMNS, ROLLUP_PERIODS
+from datetime import date, datetime, timedelta
+from sqlalchemy import desc
 from API.user import get_current_user
+from API.cache import latest_expression_cache
+from API.pagination import keyset_page
+from API.serialization import dumps, json_response, row_payload
+from typing import Optional
 
 router = APIRouter()
 
@@ -34,22 +44,79 @@ class ExpressionAnalysisResponse(BaseModel):
     NeutralScore: str
     CreatedAt: str
     
+class ExpressionAnalysisPage(BaseModel):
+    items: List[ExpressionAnalysisResponse]
+    next_cursor: Optional[str] = None
+
 def convert_to_percentage(score: float) -> str:
     """Mengubah skor float menjadi persentase dengan format 'xx.xx%'."""
     return f"{score:.4f}%"  # Ambil 5 karakter saja
 
+def format_expression(exp: ExpressionAnalysis) -> dict:
+    """Konversi satu row ExpressionAnalysis ke format response (skor dalam persentase)."""
+    return {
+        "UserID": exp.UserID,
+        "ImageID": exp.ImageID,
+        "MoodDetected": exp.MoodDetected,
+        "SadScore": convert_to_percentage(exp.SadScore),
+        "AngryScore": convert_to_percentage(exp.AngryScore),
+        "HappyScore": convert_to_percentage(exp.HappyScore),
+        "DisgustScore": convert_to_percentage(exp.DisgustScore),
+        "FearScore": convert_to_percentage(exp.FearScore),
+        "SurpriseScore": convert_to_percentage(exp.SurpriseScore),
+        "NeutralScore": convert_to_percentage(exp.NeutralScore),
+        "CreatedAt": exp.CreatedAt.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+# Kolom yang dikirim pada format compact (semua skor numerik, CreatedAt dalam epoch detik)
+COMPACT_COLUMNS = [
+    ExpressionAnalysis.AnalysisID,
+    ExpressionAnalysis.ImageID,
+    ExpressionAnalysis.MoodDetected,
+    ExpressionAnalysis.SadScore,
+    ExpressionAnalysis.AngryScore,
+    ExpressionAnalysis.HappyScore,
+    ExpressionAnalysis.DisgustScore,
+    ExpressionAnalysis.FearScore,
+    ExpressionAnalysis.SurpriseScore,
+    ExpressionAnalysis.NeutralScore,
+    ExpressionAnalysis.CreatedAt,
+]
+
+def compact_payload(user_id, rows, **extra):
+    """Format kolumnar: satu array per kolom, bukan satu object per row."""
+    names = [column.key for column in COMPACT_COLUMNS]
+    columns = {name: list(values) for name, values in zip(names, zip(*rows))} if rows else {name: [] for name in names}
+    columns["CreatedAt"] = [int(created_at.timestamp()) for created_at in columns["CreatedAt"]]
+    return {"UserID": int(user_id), "count": len(rows), "columns": columns, **extra}
+
 # Endpoint untuk mendapatkan expression analysis dari user
 @router.get("/expression_analysis", response_model=List[ExpressionAnalysisResponse], status_code=status.HTTP_200_OK)
 async def get_expression_analysis(
     db: Annotated[Session, Depends(get_db)],
+    request: Request,
     current_user: dict = Depends(get_current_user),  # Ambil user dari token
     skip: int = 0,  # Posisi mulai pagination
-    limit: int = 10  # Jumlah data yang akan di-load per halaman
+    limit: int = 10,  # Jumlah data yang akan di-load per halaman
+    format: str = "default"  # "compact": array kolumnar numerik, gzip jika didukung client
 ):
     user_id = current_user.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid user authentication")
 
+    if format == "compact":
+        rows = (
+            db.query(*COMPACT_COLUMNS)
+            .filter(ExpressionAnalysis.UserID == user_id)
+            .order_by(desc(ExpressionAnalysis.CreatedAt))
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+        if not rows:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Analisis ekspresi tidak ditemukan!")
+        return json_response(dumps(compact_payload(user_id, rows)), request)
+
     # Query dengan pengurutan berdasarkan CreatedAt descending, dan pagination dengan skip dan limit
     user_expression = (
         db.query(ExpressionAnalysis)
@@ -64,22 +131,40 @@ async def get_expression_analysis(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Analisis ekspresi tidak ditemukan!")
 
     # Konversi skor menjadi persentase
-    response = []
-    for exp in user_expression:
-        response.append({
-            "UserID": exp.UserID,
-            "ImageID": exp.ImageID,
-            "MoodDetected": exp.MoodDetected,
-            "SadScore": convert_to_percentage(exp.SadScore),
-            "AngryScore": convert_to_percentage(exp.AngryScore),
-            "HappyScore": convert_to_percentage(exp.HappyScore),
-            "DisgustScore": convert_to_percentage(exp.DisgustScore),
-            "FearScore": convert_to_percentage(exp.FearScore),
-            "SurpriseScore": convert_to_percentage(exp.SurpriseScore),
-            "NeutralScore": convert_to_percentage(exp.NeutralScore),
-            "CreatedAt": exp.CreatedAt.strftime("%Y-%m-%d %H:%M:%S")
-        })
-    return response
+    return [format_expression(exp) for exp in user_expression]
+
+# Endpoint expression analysis dengan cursor (keyset pagination); tidak melambat di halaman dalam
+@router.get("/expression_analysis/cursor", response_model=ExpressionAnalysisPage, status_code=status.HTTP_200_OK)
+async def get_expression_analysis_by_cursor(
+    db: Annotated[Session, Depends(get_db)],
+    request: Request,
+    current_user: dict = Depends(get_current_user),  # Ambil user dari token
+    cursor: Optional[str] = None,  # next_cursor dari halaman sebelumnya, kosong untuk halaman pertama
+    limit: int = 10,
+    format: str = "default"  # "compact": array kolumnar numerik, gzip jika didukung client
+):
+    user_id = current_user.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid user authentication")
+
+    if format == "compact":
+        rows, next_cursor = keyset_page(
+            db.query(*COMPACT_COLUMNS).filter(ExpressionAnalysis.UserID == user_id),
+            ExpressionAnalysis.CreatedAt,
+            ExpressionAnalysis.AnalysisID,
+            cursor=cursor,
+            limit=limit,
+        )
+        return json_response(dumps(compact_payload(user_id, rows, next_cursor=next_cursor)), request)
+
+    user_expression, next_cursor = keyset_page(
+        db.query(ExpressionAnalysis).filter(ExpressionAnalysis.UserID == user_id),
+        ExpressionAnalysis.CreatedAt,
+        ExpressionAnalysis.AnalysisID,
+        cursor=cursor,
+        limit=limit,
+    )
+    return {"items": [format_expression(exp) for exp in user_expression], "next_cursor": next_cursor}
 
 # Endpoint untuk mendapatkan detail ekspresi terbaru dari user
 @router.get("/expression_analysis/latest", status_code=status.HTTP_200_OK)
@@ -91,12 +176,17 @@ async def get_latest_expression_analysis(
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid user authentication")
 
+    # Dilayani dari cache; cache diperbarui saat deteksi baru tersimpan dan dihapus saat akun dihapus
+    cached = latest_expression_cache.get(str(user_id))
+    if cached is not None:
+        return cached
+
     # Mengambil ekspresi terbaru berdasarkan UserID dan diurutkan berdasarkan CreatedAt
     latest_expression = db.query(ExpressionAnalysis).filter(ExpressionAnalysis.UserID == user_id).order_by(ExpressionAnalysis.CreatedAt.desc()).first()
     
     if not latest_expression:
         # Jika tidak ada data ekspresi terbaru, set semua field menjadi None, kecuali MoodDetected
-        return {
+        response = {
             "AnalysisID": None,
             "UserID": None,
             "ImageID": None,
@@ -110,9 +200,17 @@ async def get_latest_expression_analysis(
             "NeutralScore": None,
             "CreatedAt": None
         }
+    else:
+        # Jika ada data ekspresi terbaru, kembalikan data tersebut
+        response = row_payload(latest_expression)
+
+    latest_expression_cache.set(str(user_id), response)
+    return response
 
-    # Jika ada data ekspresi terbaru, kembalikan data tersebut
-    return latest_expression
+# Endpoint untuk melihat statistik cache expression terbaru
+@router.get("/expression_analysis/cache_stats", status_code=status.HTTP_200_OK)
+async def get_latest_cache_stats(current_user: dict = Depends(get_current_user)):
+    return latest_expression_cache.stats()
 
 # Endpoint untuk mendapatkan jumlah mood yang terdeteksi per user berdasarkan MoodDetected
 @router.get("/expression_analysis/mood_counts", status_code=status.HTTP_200_OK)
@@ -124,33 +222,145 @@ async def get_mood_counts_by_user(
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid user authentication")
 
-    # Menghitung jumlah mood yang terdeteksi berdasarkan MoodDetected dan UserID
-    mood_counts = db.query(
-        ExpressionAnalysis.MoodDetected,
-        func.count().label('total')
-    ).filter(ExpressionAnalysis.UserID == user_id) \
-     .group_by(ExpressionAnalysis.MoodDetected).all()
-
-    # Membuat dictionary untuk menyimpan jumlah mood per tipe
-    mood_count_dict = {
-        "Happy": 0,
-        "Sad": 0,
-        "Fear": 0,
-        "Disgust": 0,
-        "Angry": 0,
-        "Surprise": 0,
-        "Neutral": 0
-    }
+    # Counter per user diperbarui setiap ada analisis baru, jadi cukup baca satu row
+    counter = db.query(UserMoodCount).filter(UserMoodCount.UserID == user_id).first()
+    if counter is None:
+        # Belum ada counter (riwayat lama sebelum tabel counter ada): hitung sekali lalu simpan
+        backfill_mood_counts(db, int(user_id))
+        db.commit()
+        counter = db.query(UserMoodCount).filter(UserMoodCount.UserID == user_id).first()
+
+    return mood_counts_to_dict(counter)
 
-    # Menambahkan jumlah mood yang terdeteksi ke dalam dictionary
-    for mood, count in mood_counts:
-        if mood in mood_count_dict:
-            mood_count_dict[mood] = count
+# Endpoint tren mood per hari/minggu, dibaca dari tabel rollup (bukan dari seluruh riwayat mentah)
+@router.get("/expression_analysis/trends", status_code=status.HTTP_200_OK)
+async def get_mood_trends(
+    db: Annotated[Session, Depends(get_db)],
+    current_user: dict = Depends(get_current_user),  # Ambil user dari token
+    period: str = "day",  # "day" atau "week"
+    start: Optional[date] = None,  # Default: 30 hari terakhir
+    end: Optional[date] = None
+):
+    user_id = current_user.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid user authentication")
+    if period not in ROLLUP_PERIODS:
+        raise HTTPException(status_code=400, detail=f"Invalid period. Valid options are: {', '.join(ROLLUP_PERIODS)}")
+
+    end = end or date.today()
+    start = start or end - timedelta(days=30)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    rollups = (
+        db.query(MoodRollup)
+        .filter(
+            MoodRollup.UserID == user_id,
+            MoodRollup.Period == period,
+            MoodRollup.BucketStart >= bucket_start(datetime.combine(start, datetime.min.time()), period),
+            MoodRollup.BucketStart <= end,
+        )
+        .order_by(MoodRollup.BucketStart)
+        .all()
+    )
+
+    buckets = []
+    for rollup in rollups:
+        count = rollup.AnalysisCount or 0
+        buckets.append({
+            "date": rollup.BucketStart.isoformat(),
+            "count": count,
+            "averages": {
+                mood: (getattr(rollup, f"{column}Sum") / count if count else None)
+                for mood, column in SCORE_COLUMNS.items()
+            },
+            "dominant": {mood: getattr(rollup, column) for mood, column in MOOD_COUNT_COLUMNS.items()},
+        })
 
-    # Menambahkan total perhitungan semua mood
-    total_moods = sum(mood_count_dict.values())
+    return {"period": period, "start": start.isoformat(), "end": end.isoformat(), "buckets": buckets}
 
-    # Menambahkan total ke dalam dictionary
-    mood_count_dict["Total"] = total_moods
+# Kolom export: semua kolom analisis ditambah ImagePath dari tabel images
+EXPORT_COLUMNS = [
+    ExpressionAnalysis.AnalysisID,
+    ExpressionAnalysis.ImageID,
+    Image.ImagePath,
+    ExpressionAnalysis.MoodDetected,
+    ExpressionAnalysis.SadScore,
+    ExpressionAnalysis.AngryScore,
+    ExpressionAnalysis.HappyScore,
+    ExpressionAnalysis.DisgustScore,
+    ExpressionAnalysis.FearScore,
+    ExpressionAnalysis.SurpriseScore,
+    ExpressionAnalysis.NeutralScore,
+    ExpressionAnalysis.CreatedAt,
+]
+EXPORT_BATCH_SIZE = 500
 
-    return mood_count_dict
+def export_rows(user_id):
+    """Baca riwayat user bertahap lewat server-side cursor; memori tetap kecil berapa pun jumlah row."""
+    # Session sendiri karena generator masih berjalan setelah handler (dan session dependency) selesai
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(*EXPORT_COLUMNS)
+            .outerjoin(Image, ExpressionAnalysis.ImageID == Image.ImageID)
+            .filter(ExpressionAnalysis.UserID == user_id)
+            .order_by(ExpressionAnalysis.CreatedAt, ExpressionAnalysis.AnalysisID)
+            .execution_options(stream_results=True)
+            .yield_per(EXPORT_BATCH_SIZE)
+        )
+        for row in query:
+            yield row
+    finally:
+        db.close()
+
+def export_csv(user_id):
+    names = [column.key for column in EXPORT_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for count, row in enumerate(export_rows(user_id), start=1):
+        writer.writerow([value.strftime("%Y-%m-%d %H:%M:%S") if name == "CreatedAt" else value for name, value in zip(names, row)])
+        # Kirim per batch, bukan per row, agar overhead chunk kecil
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+def export_ndjson(user_id):
+    names = [column.key for column in EXPORT_COLUMNS]
+    lines = []
+    for row in export_rows(user_id):
+        record = dict(zip(names, row))
+        record["CreatedAt"] = record["CreatedAt"].strftime("%Y-%m-%d %H:%M:%S")
+        lines.append(json.dumps(record))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+EXPORT_FORMATS = {
+    "csv": (export_csv, "text/csv"),
+    "ndjson": (export_ndjson, "application/x-ndjson"),
+}
+
+# Endpoint export seluruh riwayat expression analysis user (CSV atau NDJSON), dikirim secara streaming
+@router.get("/expression_analysis/export", status_code=status.HTTP_200_OK)
+async def export_expression_analysis(
+    current_user: dict = Depends(get_current_user),  # Ambil user dari token
+    format: str = "csv"
+):
+    user_id = current_user.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid user authentication")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Valid options are: {', '.join(EXPORT_FORMATS)}")
+
+    generator, media_type = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        generator(user_id),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="expression_analysis_{user_id}.{format}"'}
+    )
@@ -0,0 +1,66 @@
+import os
+import threading
+import cv2
+import numpy as np
+
+CASCADE_PATH = './FacialEmotion/haarcascade_frontalface_default.xml'
+
+# Mode deteksi cepat: cascade dijalankan pada salinan gambar yang diperkecil
+FACE_DETECT_FAST = os.getenv("FACE_DETECT_FAST", "0") == "1"
+# Sisi terpanjang gambar yang diperkecil (pixel)
+FACE_DETECT_MAX_SIDE = int(os.getenv("FACE_DETECT_MAX_SIDE", "640"))
+# Ukuran wajah minimum relatif terhadap sisi terpendek gambar
+FACE_DETECT_MIN_FACE_RATIO = float(os.getenv("FACE_DETECT_MIN_FACE_RATIO", "0.1"))
+
+# Ukuran window training haarcascade_frontalface_default
+CASCADE_WINDOW = 24
+
+# Face detector dibuat per thread worker karena CascadeClassifier tidak thread-safe
+_local = threading.local()
+
+def get_face_detector():
+    if not hasattr(_local, "face_detect"):
+        _local.face_detect = cv2.CascadeClassifier(CASCADE_PATH)
+    return _local.face_detect
+
+def decode_grayscale(data: bytes):
+    """Decode bytes upload langsung menjadi array grayscale tanpa menulis ke disk."""
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+
+def detect_faces_full(gray):
+    """Deteksi wajah pada resolusi penuh (perilaku awal)."""
+    return get_face_detector().detectMultiScale(gray, 1.3, 3)
+
+def detect_faces_fast(gray, max_side=FACE_DETECT_MAX_SIDE, min_face_ratio=FACE_DETECT_MIN_FACE_RATIO):
+    """Deteksi wajah pada salinan yang diperkecil dengan minSize adaptif, lalu petakan box ke resolusi penuh."""
+    height, width = gray.shape[:2]
+    scale = min(1.0, max_side / float(max(height, width)))
+    if scale < 1.0:
+        small = cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+    else:
+        small = gray
+
+    min_side = max(CASCADE_WINDOW, int(min(small.shape[:2]) * min_face_ratio))
+    faces = get_face_detector().detectMultiScale(small, 1.3, 3, minSize=(min_side, min_side))
+    if len(faces) == 0:
+        return faces
+
+    # Kembalikan koordinat ke gambar asli dan pastikan tetap di dalam batas gambar
+    boxes = np.round(np.asarray(faces, dtype=np.float64) / scale).astype(int)
+    boxes[:, 0] = np.clip(boxes[:, 0], 0, width - 1)
+    boxes[:, 1] = np.clip(boxes[:, 1], 0, height - 1)
+    boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+    boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+    return boxes
+
+def detect_faces(gray, fast=None):
+    if fast is None:
+        fast = FACE_DETECT_FAST
+    return detect_faces_fast(gray) if fast else detect_faces_full(gray)
+
+def prepare_face(gray, box):
+    """Crop wajah, resize ke 48x48 dan normalisasi ke 0-1."""
+    (x, y, w, h) = box
+    sub_face_img = gray[y:y + h, x:x + w]
+    resized = cv2.resize(sub_face_img, (48, 48))
+    return resized / 255.0
@@ -6,6 +6,8 @@ from typing import Annotated
 from API.user import get_current_user
 from database import get_db
 from models import Image
+from API.pagination import keyset_page
+from typing import Optional
 import os
 from uuid import uuid4
 import shutil
@@ -65,6 +67,23 @@ async def get_images_by_user(user_id: int, db: Annotated[Session, Depends(get_db
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Gambar tidak ditemukan untuk user ini!")
     return images
 
+# Endpoint untuk mendapatkan image user dengan cursor (keyset pagination)
+@router.get("/images/user/{user_id}/cursor", status_code=status.HTTP_200_OK)
+async def get_images_by_user_cursor(
+    user_id: int,
+    db: Annotated[Session, Depends(get_db)],
+    cursor: Optional[str] = None,  # next_cursor dari halaman sebelumnya
+    limit: int = 10
+):
+    images, next_cursor = keyset_page(
+        db.query(Image).filter(Image.UserID == user_id),
+        Image.CreatedAt,
+        Image.ImageID,
+        cursor=cursor,
+        limit=limit,
+    )
+    return {"items": images, "next_cursor": next_cursor}
+
 # Endpoint untuk mendapatkan image paling baru berdasarkan user_id
 @router.get("/images/latest/{user_id}", status_code=status.HTTP_200_OK)
 async def get_latest_image(user_id: int, db: Annotated[Session, Depends(get_db)]):
@@ -0,0 +1,286 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from API.model_runtime import create_interpreter, runtime_name
+
+# Varian model yang tersedia; float16 dan int8 adalah hasil kuantisasi dari model float32
+MODEL_VARIANTS = {
+    "float32": './FacialEmotion/200epoch.tflite',
+    "float16": './FacialEmotion/200epoch_float16.tflite',
+    "int8": './FacialEmotion/200epoch_int8.tflite',
+}
+MODEL_VARIANT = os.getenv("MODEL_VARIANT", "float32")
+if MODEL_VARIANT not in MODEL_VARIANTS:
+    raise ValueError(f"Unknown MODEL_VARIANT: {MODEL_VARIANT}. Valid options are: {', '.join(MODEL_VARIANTS)}")
+MODEL_PATH = os.getenv("MODEL_PATH", MODEL_VARIANTS[MODEL_VARIANT])
+
+# Pengaturan micro-batching: jumlah wajah maksimum per invoke dan lama menunggu request lain
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+# Batas atas pengaturan di atas; waktu tunggu besar menahan setiap deteksi di proses ini
+BATCH_SIZE_LIMIT = 64
+MAX_WAIT_MS_LIMIT = 100.0
+
+def available_cpus():
+    """Core yang boleh dipakai proses ini (affinity/cpuset container), bukan jumlah core host."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # sched_getaffinity tidak ada di macOS/Windows
+        return os.cpu_count() or 1
+
+# Jumlah interpreter (dan thread worker) mengikuti jumlah core yang tersedia
+INFERENCE_POOL_SIZE = int(os.getenv("INFERENCE_POOL_SIZE", str(available_cpus())))
+
+# Executor untuk pekerjaan CPU-bound (decode, deteksi wajah, inferensi) agar event loop tetap responsif
+executor = ThreadPoolExecutor(max_workers=INFERENCE_POOL_SIZE, thread_name_prefix="detect")
+
+
+class BatchInterpreter:
+    """TFLite interpreter yang input tensor-nya di-resize mengikuti ukuran batch."""
+
+    def __init__(self, model_path=MODEL_PATH):
+        self.interpreter = create_interpreter(model_path)
+        self.interpreter.allocate_tensors()
+        input_details = self.interpreter.get_input_details()[0]
+        output_details = self.interpreter.get_output_details()[0]
+        self.input_index = input_details['index']
+        self.output_index = output_details['index']
+        # Model int8 memakai input/output terkuantisasi; float32 dan float16 tetap menerima float32
+        self.input_dtype = input_details['dtype']
+        self.input_quantization = input_details['quantization']
+        self.output_quantization = output_details['quantization']
+        self.batch_size = 1
+
+    def quantize_input(self, batch):
+        """Skala input 0-1 ke dtype input model (float32, atau int8/uint8 dengan scale dan zero point)."""
+        if not np.issubdtype(self.input_dtype, np.integer):
+            return batch.astype(self.input_dtype)
+        scale, zero_point = self.input_quantization
+        info = np.iinfo(self.input_dtype)
+        quantized = np.round(batch / scale + zero_point)
+        return np.clip(quantized, info.min, info.max).astype(self.input_dtype)
+
+    def dequantize_output(self, result):
+        scale, zero_point = self.output_quantization
+        if not np.issubdtype(result.dtype, np.integer) or scale == 0:
+            return result.astype(np.float32)
+        return (result.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch):
+        # allocate_tensors cukup mahal, jadi hanya dilakukan saat ukuran batch berubah
+        if batch.shape[0] != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_index, list(batch.shape))
+            self.interpreter.allocate_tensors()
+            self.batch_size = batch.shape[0]
+        self.interpreter.set_tensor(self.input_index, self.quantize_input(batch))
+        self.interpreter.invoke()
+        return self.dequantize_output(self.interpreter.get_tensor(self.output_index))
+
+
+class InterpreterPool:
+    """Kumpulan interpreter, satu per worker, karena Interpreter TFLite tidak thread-safe.
+
+    Interpreter baru dibuat saat pertama kali dipakai (atau lewat warm_up), sehingga
+    import modul ini tidak memuat runtime model sama sekali.
+    """
+
+    def __init__(self, size=INFERENCE_POOL_SIZE, model_path=MODEL_PATH):
+        self.size = size
+        self.model_path = model_path
+        self._interpreters = queue.Queue()
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                for _ in range(self.size):
+                    self._interpreters.put(BatchInterpreter(self.model_path))
+                self._loaded = True
+
+    def warm_up(self):
+        """Muat semua interpreter dan jalankan satu invoke dummy di masing-masing.
+
+        Interpreter diambil satu per satu dan langsung dikembalikan, jadi warm-up yang berjalan
+        bersamaan tidak pernah menahan sebagian pool sambil menunggu sisanya.
+        """
+        self.load()
+        for _ in range(self.size):
+            interpreter = self._interpreters.get()
+            try:
+                interpreter.predict(np.zeros((1, 48, 48, 1), dtype=np.float32))
+            finally:
+                self._interpreters.put(interpreter)
+
+    def predict(self, batch):
+        self.load()
+        interpreter = self._interpreters.get()
+        try:
+            return interpreter.predict(batch)
+        finally:
+            self._interpreters.put(interpreter)
+
+
+class InferenceScheduler:
+    """Mengumpulkan wajah dari request yang berjalan bersamaan lalu menjalankan satu invoke per batch."""
+
+    def __init__(self, model, max_batch_size=INFERENCE_MAX_BATCH_SIZE, max_wait_ms=INFERENCE_MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_size = 1
+        self.max_wait_ms = 0.0
+        self.configure(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        # Batch yang berjalan bersamaan dibatasi sebanyak interpreter yang tersedia
+        self.concurrency = getattr(model, "size", 1)
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._slots = None
+        self._in_flight = 0
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "faces": 0,
+            "batches": 0,
+            "max_batch_seen": 0,
+            "queue_wait_ms_total": 0.0,
+            "invoke_ms_total": 0.0,
+            "batch_size_histogram": {},
+        }
+
+    def configure(self, max_batch_size=None, max_wait_ms=None):
+        if max_batch_size is not None:
+            if not 1 <= max_batch_size <= BATCH_SIZE_LIMIT:
+                raise ValueError(f"max_batch_size must be between 1 and {BATCH_SIZE_LIMIT}")
+            self.max_batch_size = max_batch_size
+        if max_wait_ms is not None:
+            if not 0 <= max_wait_ms <= MAX_WAIT_MS_LIMIT:
+                raise ValueError(f"max_wait_ms must be between 0 and {MAX_WAIT_MS_LIMIT:g}")
+            self.max_wait_ms = max_wait_ms
+
+    async def predict(self, faces):
+        """faces: array (n, 48, 48, 1) yang sudah dinormalisasi. Mengembalikan array probabilitas (n, 7)."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((faces, future, time.perf_counter()))
+        return await future
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._worker = loop.create_task(self._run())
+
+    async def _collect(self):
+        pending = [await self._queue.get()]
+        total = pending[0][0].shape[0]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while total < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            pending.append(item)
+            total += item[0].shape[0]
+        return pending
+
+    async def _run(self):
+        while True:
+            # Tunggu interpreter kosong dulu, sementara itu request baru menumpuk menjadi batch
+            await self._slots.acquire()
+            try:
+                pending = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            self._in_flight += 1
+            task = self._loop.create_task(self._dispatch(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, pending):
+        try:
+            batch = np.concatenate([faces for faces, _, _ in pending], axis=0)
+            started = time.perf_counter()
+            try:
+                result = await self._loop.run_in_executor(executor, self.model.predict, batch)
+            except Exception as e:
+                for _, future, _ in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            finished = time.perf_counter()
+            self._record(pending, batch.shape[0], started, finished)
+
+            # Kembalikan baris probabilitas ke masing-masing pemanggil
+            offset = 0
+            for faces, future, _ in pending:
+                count = faces.shape[0]
+                if not future.done():
+                    future.set_result(result[offset:offset + count])
+                offset += count
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    def _record(self, pending, batch_size, started, finished):
+        with self._lock:
+            stats = self._stats
+            stats["requests"] += len(pending)
+            stats["faces"] += batch_size
+            stats["batches"] += 1
+            stats["max_batch_seen"] = max(stats["max_batch_seen"], batch_size)
+            stats["queue_wait_ms_total"] += sum((started - queued) * 1000.0 for _, _, queued in pending)
+            stats["invoke_ms_total"] += (finished - started) * 1000.0
+            histogram = stats["batch_size_histogram"]
+            histogram[batch_size] = histogram.get(batch_size, 0) + 1
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["batch_size_histogram"] = dict(sorted(self._stats["batch_size_histogram"].items()))
+        batches = stats["batches"] or 1
+        requests = stats["requests"] or 1
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "pool_size": self.concurrency,
+            "runtime": runtime_name(),
+            "model_variant": MODEL_VARIANT,
+            "model_path": getattr(self.model, "model_path", None),
+            "model_loaded": getattr(self.model, "loaded", True),
+            "batches_in_flight": self._in_flight,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "requests": stats["requests"],
+            "faces": stats["faces"],
+            "batches": stats["batches"],
+            "avg_batch_size": stats["faces"] / batches,
+            "max_batch_seen": stats["max_batch_seen"],
+            "avg_queue_wait_ms": stats["queue_wait_ms_total"] / requests,
+            "avg_invoke_ms": stats["invoke_ms_total"] / batches,
+            "batch_size_histogram": stats["batch_size_histogram"],
+        }
+
+
+interpreter_pool = InterpreterPool()
+scheduler = InferenceScheduler(interpreter_pool)
+
+def warm_up():
+    """Hook warm-up eksplisit: muat runtime dan model sebelum request pertama datang."""
+    interpreter_pool.warm_up()
+    return runtime_name()
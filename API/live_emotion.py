@@ -0,0 +1,157 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, status
+from database import SessionLocal
+from API.user import verify_token
+from API.inference import scheduler, executor
+from API.face_detection import decode_grayscale, detect_faces, prepare_face
+from API.persistence import labels_dict, analysis_scores, save_detections
+from API.detect import save_upload, UPLOAD_DIR
+from uuid import uuid4
+import asyncio
+import os
+import time
+import numpy as np
+
+# Cascade dijalankan ulang setiap N frame; di antaranya box wajah terakhir dipakai lagi
+LIVE_DETECT_EVERY = int(os.getenv("LIVE_DETECT_EVERY", "5"))
+# Bobot frame terbaru pada exponential smoothing (0-1, makin kecil makin halus)
+LIVE_SMOOTHING_ALPHA = float(os.getenv("LIVE_SMOOTHING_ALPHA", "0.3"))
+# Hanya satu sampel per interval (detik) yang disimpan sebagai ExpressionAnalysis
+LIVE_PERSIST_INTERVAL = float(os.getenv("LIVE_PERSIST_INTERVAL", "30"))
+
+router = APIRouter()
+
+class LatestFrame:
+    """Slot berisi satu frame terbaru. Frame lama yang belum diproses ditimpa (dihitung sebagai drop)."""
+
+    def __init__(self):
+        self.frame = None
+        self.dropped = 0
+        self.closed = False
+        self._event = asyncio.Event()
+
+    def put(self, data: bytes):
+        if self.frame is not None:
+            self.dropped += 1
+        self.frame = data
+        self._event.set()
+
+    def close(self):
+        self.closed = True
+        self._event.set()
+
+    async def take(self):
+        await self._event.wait()
+        self._event.clear()
+        frame, self.frame = self.frame, None
+        return frame
+
+def extract_live_face(data: bytes, box, detect: bool):
+    """Siapkan tensor wajah dari satu frame. Cascade hanya dijalankan jika detect=True atau box belum ada."""
+    gray = decode_grayscale(data)
+    if gray is None:
+        raise ValueError("Frame is not a valid image")
+
+    height, width = gray.shape[:2]
+    if box is not None and (box[0] + box[2] > width or box[1] + box[3] > height):
+        box = None  # Ukuran frame berubah, box lama tidak berlaku
+    if detect or box is None:
+        faces = detect_faces(gray)
+        box = tuple(int(v) for v in faces[0]) if len(faces) else None
+    if box is None:
+        return None, None
+    return box, np.reshape(prepare_face(gray, box), (1, 48, 48, 1)).astype(np.float32)
+
+def persist_sample(user_id, data: bytes, smoothed):
+    """Simpan frame sampel beserta vektor probabilitas yang sudah di-smoothing."""
+    unique_filename = f"{uuid4().hex}.jpg"
+    save_upload(os.path.join(UPLOAD_DIR, unique_filename), data)
+    db = SessionLocal()
+    try:
+        save_detections(db, [(user_id, f"images/user-faces/{unique_filename}", smoothed[np.newaxis])])
+    finally:
+        db.close()
+
+async def receive_frames(websocket: WebSocket, slot: LatestFrame):
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                slot.put(message["bytes"])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        slot.close()
+
+# WebSocket untuk deteksi emosi live: client mengirim frame JPEG (binary), server membalas JSON per frame
+@router.websocket("/ws/live_emotion")
+async def live_emotion(websocket: WebSocket, token: str):
+    # Header Authorization tidak bisa dikirim dari WebSocket browser, jadi token lewat query string
+    try:
+        user_id = verify_token(token).get("sub")
+    except HTTPException:
+        user_id = None
+    if not user_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    slot = LatestFrame()
+    receiver = asyncio.ensure_future(receive_frames(websocket, slot))
+    loop = asyncio.get_running_loop()
+
+    box = None
+    smoothed = None
+    processed = 0
+    last_persisted = 0.0
+    persist_tasks = set()
+    try:
+        while True:
+            data = await slot.take()
+            if data is None:
+                if slot.closed:
+                    break
+                continue
+
+            detect = processed % LIVE_DETECT_EVERY == 0
+            processed += 1
+            try:
+                box, face = await loop.run_in_executor(executor, extract_live_face, data, box, detect)
+            except ValueError as e:
+                await websocket.send_json({"frame": processed, "error": str(e)})
+                continue
+            if face is None:
+                await websocket.send_json({"frame": processed, "face": None, "dropped": slot.dropped})
+                continue
+
+            result = (await scheduler.predict(face))[0]
+            probabilities = result / np.sum(result)
+            if smoothed is None:
+                smoothed = probabilities
+            else:
+                smoothed = LIVE_SMOOTHING_ALPHA * probabilities + (1 - LIVE_SMOOTHING_ALPHA) * smoothed
+
+            scores = analysis_scores(smoothed)
+            await websocket.send_json({
+                "frame": processed,
+                "face": {"x": box[0], "y": box[1], "w": box[2], "h": box[3]},
+                "MoodDetected": scores["MoodDetected"],
+                "probabilities": {labels_dict[i]: float(p) for i, p in enumerate(probabilities)},
+                "smoothed": {labels_dict[i]: float(p) for i, p in enumerate(smoothed)},
+                "dropped": slot.dropped,
+            })
+
+            # Simpan sampel secara berkala saja agar database tidak kebanjiran row
+            now = time.monotonic()
+            if now - last_persisted >= LIVE_PERSIST_INTERVAL:
+                last_persisted = now
+                task = loop.run_in_executor(None, persist_sample, user_id, data, smoothed.copy())
+                persist_tasks.add(task)
+                task.add_done_callback(persist_tasks.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        if persist_tasks:
+            await asyncio.gather(*persist_tasks, return_exceptions=True)
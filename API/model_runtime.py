@@ -0,0 +1,58 @@
+import importlib
+import os
+import threading
+
+# Runtime TFLite yang dipakai: "auto" memilih runtime paling ringan yang terpasang
+MODEL_RUNTIME = os.getenv("MODEL_RUNTIME", "auto")
+# Thread per interpreter; paralelisme didapat dari pool interpreter, bukan dari thread internal TFLite
+MODEL_NUM_THREADS = int(os.getenv("MODEL_NUM_THREADS", "1"))
+
+# Urutan dari yang paling ringan; tensorflow penuh hanya sebagai fallback
+RUNTIMES = {
+    "tflite_runtime": ("tflite_runtime.interpreter", "Interpreter"),
+    "ai_edge_litert": ("ai_edge_litert.interpreter", "Interpreter"),
+    "tensorflow": ("tensorflow.lite", "Interpreter"),
+}
+
+_lock = threading.Lock()
+_interpreter_class = None
+_runtime_name = None
+
+def _import_runtime(name):
+    module_name, attribute = RUNTIMES[name]
+    return getattr(importlib.import_module(module_name), attribute)
+
+def get_interpreter_class():
+    """Import kelas Interpreter saat pertama kali dibutuhkan, bukan saat modul di-import."""
+    global _interpreter_class, _runtime_name
+    if _interpreter_class is not None:
+        return _interpreter_class
+
+    with _lock:
+        if _interpreter_class is None:
+            if MODEL_RUNTIME != "auto":
+                if MODEL_RUNTIME not in RUNTIMES:
+                    raise ValueError(f"Unknown MODEL_RUNTIME: {MODEL_RUNTIME}")
+                candidates = [MODEL_RUNTIME]
+            else:
+                candidates = list(RUNTIMES)
+
+            for name in candidates:
+                try:
+                    interpreter_class = _import_runtime(name)
+                except ImportError:
+                    continue
+                _runtime_name = name
+                _interpreter_class = interpreter_class
+                break
+            else:
+                raise ImportError(f"No TFLite runtime available (tried: {', '.join(candidates)})")
+    return _interpreter_class
+
+def create_interpreter(model_path):
+    interpreter_class = get_interpreter_class()
+    return interpreter_class(model_path=model_path, num_threads=MODEL_NUM_THREADS)
+
+def runtime_name():
+    """Nama runtime yang sedang dipakai, atau None jika model belum dimuat."""
+    return _runtime_name
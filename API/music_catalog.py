@@ -0,0 +1,56 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from API.catalog import Catalog
+import models
+import os
+
+# Interval (detik) pengecekan apakah catalog di database diubah oleh worker lain
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "60"))
+
+mood_mapping = {
+    "happy": ["Happy", "Calm"],
+    "sad": ["Sad", "Calm"],
+    "angry": ["Energetic", "Calm"],
+    "disgust": ["Energetic", "Happy", "Calm"],
+    "fear": ["Happy", "Calm"],
+    "surprise": ["Energetic", "Happy", "Sad"],
+    "neutral": ["Energetic", "Happy", "Calm", "Sad"]
+}
+
+# MoodClassification -> key mood_mapping yang memuat klasifikasi itu
+moods_for_classification = {
+    classification: [mood for mood, classifications in mood_mapping.items() if classification in classifications]
+    for classification in {c for classifications in mood_mapping.values() for c in classifications}
+}
+
+class MusicCatalog(Catalog):
+    """Catalog musik in-memory yang diindeks per MoodClassification dan per mood user.
+
+    Dibangun sekali saat startup, lalu diperbarui per lagu setelah endpoint yang menulis catalog
+    selesai commit.
+    """
+
+    model = models.MusicDataset
+    key = "MusicID"
+    refresh_interval = CATALOG_REFRESH_INTERVAL
+
+    def _signature_of(self, db: Session):
+        # Jumlah row dan UpdatedAt terbaru cukup untuk mendeteksi perubahan dari worker lain
+        return tuple(db.query(func.count(models.MusicDataset.MusicID), func.max(models.MusicDataset.UpdatedAt)).one())
+
+    def _groups(self, song: dict):
+        classification = song["MoodClassification"]
+        groups = [("classification", classification)]
+        groups += [("mood", mood) for mood in moods_for_classification.get(classification, [])]
+        return groups
+
+    def all_songs(self):
+        return self.all_rows()
+
+    def songs_for_mood(self, mood: str):
+        return self.rows_for("mood", mood)
+
+    def songs_for_classification(self, classification: str):
+        return self.rows_for("classification", classification)
+
+music_catalog = MusicCatalog()
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, FastAPI, HTTPException, Depends, status
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Query, Request, status
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 import models  
 from database import engine, SessionLocal  
 from pydantic import BaseModel, validator
-from typing import List, Annotated
+from typing import List, Annotated, Optional
 from database import get_db
+from API.music_catalog import mood_mapping, music_catalog
+from API.recommendation import recommend
+from API.cache import latest_expression_cache
+from API.user import get_current_user
+from API.serialization import PreparedBodies, prepared_response, row_payload, CATALOG_CACHE_CONTROL
 
 router = APIRouter()
 
@@ -32,15 +37,8 @@ class MusicDatasetResponse(BaseModel):
     class Config:
         orm_mode = True
 
-mood_mapping = {
-    "happy": ["Happy", "Calm"],
-    "sad": ["Sad", "Calm"],
-    "angry": ["Energetic", "Calm"],
-    "disgust": ["Energetic", "Happy", "Calm"],
-    "fear": ["Happy", "Calm"],
-    "surprise": ["Energetic", "Happy", "Sad"],
-    "neutral": ["Energetic", "Happy", "Calm", "Sad"]
-}
+# Body JSON siap kirim per endpoint/mood, dibuat ulang hanya saat version catalog berubah
+music_bodies = PreparedBodies()
 
 # Endpoint untuk menambah music dataset
 @router.post("/music_dataset/", response_model=MusicDatasetCreate, status_code=status.HTTP_201_CREATED)
@@ -56,16 +54,19 @@ async def create_music_dataset(dataset: MusicDatasetCreate, db: Annotated[Sessio
     db.add(db_dataset)
     db.commit()
     db.refresh(db_dataset)
+    music_catalog.refresh_ids(db, [db_dataset.MusicID])
     return db_dataset
 
-# Endpoint untuk mendapatkan semua music datasets
+# Endpoint untuk mendapatkan semua music datasets (dari catalog in-memory, dengan ETag)
 @router.get("/music_dataset/", status_code=status.HTTP_200_OK)
-async def get_music_dataset(db: Annotated[Session, Depends(get_db)]):
-    return db.query(models.MusicDataset).all()
+async def get_music_dataset(request: Request, db: Annotated[Session, Depends(get_db)]):
+    music_catalog.ensure_fresh(db)
+    prepared = music_bodies.get("all", music_catalog.version, music_catalog.all_songs)
+    return prepared_response(prepared, request, CATALOG_CACHE_CONTROL, {"X-Catalog-Version": music_catalog.version})
 
-# Endpoint untuk mendapatkan lagu berdasarkan MoodClassification
+# Endpoint untuk mendapatkan lagu berdasarkan MoodClassification (dilayani dari catalog in-memory)
 @router.get("/music_dataset/mood/{mood}", response_model=List[MusicDatasetResponse], status_code=status.HTTP_200_OK)
-async def get_music_by_mood(mood: str, db: Annotated[Session, Depends(get_db)]):
+async def get_music_by_mood(mood: str, request: Request, db: Annotated[Session, Depends(get_db)]):
     # Validasi input mood
     if mood not in mood_mapping:
         raise HTTPException(
@@ -73,17 +74,46 @@ async def get_music_by_mood(mood: str, db: Annotated[Session, Depends(get_db)]):
             detail=f"Invalid mood. Valid options are: {', '.join(mood_mapping.keys())}"
         )
 
-    # Ambil MoodClassification yang sesuai dengan mood
-    mood_classifications = mood_mapping[mood]
-
-    # Filter lagu berdasarkan MoodClassification yang sesuai
-    songs = (
-        db.query(models.MusicDataset)
-        .filter(models.MusicDataset.MoodClassification.in_(mood_classifications))
-        .all()
-    )
+    music_catalog.ensure_fresh(db)
+    songs = music_catalog.songs_for_mood(mood)
 
     if not songs:
         raise HTTPException(status_code=404, detail=f"No songs found for mood: {mood}")
 
-    return songs
\ No newline at end of file
+    # Hanya field MusicDatasetResponse, seperti response_model sebelumnya
+    prepared = music_bodies.get(f"mood:{mood}", music_catalog.version, lambda: [
+        {field: song[field] for field in MusicDatasetResponse.__fields__} for song in songs
+    ])
+    return prepared_response(prepared, request, CATALOG_CACHE_CONTROL, {"X-Catalog-Version": music_catalog.version})
+
+# Versi catalog musik; berubah setiap kali ada lagu yang ditambah, diubah, atau dihapus
+@router.get("/music_dataset/version", status_code=status.HTTP_200_OK)
+async def get_music_catalog_version(db: Annotated[Session, Depends(get_db)]):
+    music_catalog.ensure_fresh(db)
+    return {"version": music_catalog.version}
+
+# Rekomendasi lagu berbobot dari tujuh skor ekspresi terbaru user (bukan hanya MoodDetected)
+@router.get("/music_dataset/recommendations", status_code=status.HTTP_200_OK)
+async def get_music_recommendations(
+    db: Annotated[Session, Depends(get_db)],
+    current_user: dict = Depends(get_current_user),
+    limit: int = Query(20, ge=1, le=100),
+    seed: Optional[int] = Query(None, ge=0, description="Seed sampling; seed yang sama menghasilkan urutan yang sama"),
+    exclude: List[int] = Query([], description="MusicID yang baru diputar dan tidak boleh direkomendasikan"),
+):
+    user_id = current_user.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid user authentication")
+
+    latest = latest_expression_cache.get(str(user_id))
+    if latest is None:
+        analysis = (
+            db.query(models.ExpressionAnalysis)
+            .filter(models.ExpressionAnalysis.UserID == user_id)
+            .order_by(models.ExpressionAnalysis.CreatedAt.desc())
+            .first()
+        )
+        latest = row_payload(analysis) if analysis else None
+
+    music_catalog.ensure_fresh(db)
+    return recommend(latest, limit, seed=seed, exclude=exclude)
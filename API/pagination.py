@@ -0,0 +1,41 @@
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+from datetime import datetime
+import base64
+import json
+
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Cursor opaque berisi posisi (CreatedAt, ID) dari row terakhir di halaman."""
+    payload = json.dumps([created_at.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def keyset_page(query, created_column, id_column, cursor: str = None, limit: int = 10):
+    """Ambil satu halaman terurut CreatedAt DESC, ID DESC mulai setelah cursor (keyset pagination).
+
+    Mengembalikan (rows, next_cursor); next_cursor None jika sudah halaman terakhir.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            created_column < created_at,
+            and_(created_column == created_at, id_column < row_id)
+        ))
+
+    # Ambil satu row lebih untuk mengetahui apakah masih ada halaman berikutnya
+    rows = query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
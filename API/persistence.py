@@ -0,0 +1,209 @@
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from models import Image, ExpressionAnalysis
+from database import SessionLocal
+from API.aggregates import apply_new_analyses, analysis_created_at
+from API.cache import latest_expression_cache
+import logging
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# "sync": simpan langsung di handler, "write_behind": masukkan ke antrean dan simpan bulk di background
+PERSIST_MODE = os.getenv("PERSIST_MODE", "sync")
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "1000"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5"))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "200"))
+
+labels_dict = {0: 'Angry', 1: 'Disgust', 2: 'Fear', 3: 'Happy', 4: 'Neutral', 5: 'Sad', 6: 'Surprise'}
+
+def analysis_scores(emotion_probabilities):
+    """Ubah satu baris probabilitas model menjadi kolom ExpressionAnalysis (skor dalam persen)."""
+    label = int(np.argmax(emotion_probabilities))
+    total_probability = np.sum(emotion_probabilities)
+    percentage_probabilities = (emotion_probabilities / total_probability) * 100
+    return {
+        "MoodDetected": labels_dict[label],
+        "SadScore": float(percentage_probabilities[5]),
+        "AngryScore": float(percentage_probabilities[0]),
+        "HappyScore": float(percentage_probabilities[3]),
+        "DisgustScore": float(percentage_probabilities[1]),
+        "FearScore": float(percentage_probabilities[2]),
+        "SurpriseScore": float(percentage_probabilities[6]),
+        "NeutralScore": float(percentage_probabilities[4]),
+    }
+
+def save_detections(db: Session, detections):
+    """Simpan banyak hasil deteksi dengan bulk insert dalam satu transaksi.
+
+    detections: list of (user_id, image_path, probabilities) dengan probabilities
+    berbentuk (jumlah wajah, 7). Mengembalikan dict {image_path: ImageID}.
+    """
+    if not detections:
+        return {}
+
+    # Multi-row insert untuk semua image, lalu ambil ID-nya lewat ImagePath (unik per upload)
+    db.execute(insert(Image), [
+        {"UserID": user_id, "ImagePath": image_path}
+        for user_id, image_path, _ in detections
+    ])
+    paths = [image_path for _, image_path, _ in detections]
+    image_ids = dict(
+        db.query(Image.ImagePath, Image.ImageID).filter(Image.ImagePath.in_(paths)).all()
+    )
+
+    # CreatedAt diisi dari aplikasi agar bucket rollup sama dengan nilai yang tersimpan
+    created_at = analysis_created_at()
+    analyses = [
+        {"UserID": user_id, "ImageID": image_ids[image_path], "CreatedAt": created_at, **analysis_scores(row)}
+        for user_id, image_path, probabilities in detections
+        for row in probabilities
+    ]
+    db.execute(insert(ExpressionAnalysis), analyses)
+    apply_new_analyses(db, analyses)
+    db.commit()
+
+    # Expression terbaru user berubah; entry cache dibuang dan diisi ulang saat dibaca
+    for user_id in {str(user_id) for user_id, _, _ in detections}:
+        latest_expression_cache.delete(user_id)
+    return image_ids
+
+
+class WriteBehindQueue:
+    """Antrean Image/ExpressionAnalysis yang disimpan oleh thread background dengan bulk insert.
+
+    Satu flush = satu transaksi berisi semua item yang terkumpul selama flush_interval
+    (maksimal max_batch item). stop() menyimpan semua sisa antrean sebelum berhenti.
+    """
+
+    _STOP = object()
+
+    def __init__(self, max_queue=WRITE_BEHIND_MAX_QUEUE, flush_interval=WRITE_BEHIND_FLUSH_INTERVAL, max_batch=WRITE_BEHIND_MAX_BATCH):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        # Statistik diubah thread flush dan dibaca/diubah handler request
+        self._stats_lock = threading.Lock()
+        self._stats = {"queued": 0, "flushed": 0, "commits": 0, "failures": 0, "dropped": 0, "rejected": 0}
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+
+    def submit(self, user_id, image_path, probabilities):
+        """Masukkan satu hasil deteksi ke antrean. Mengembalikan False jika antrean penuh."""
+        self.start()
+        try:
+            self._queue.put_nowait((user_id, image_path, probabilities))
+        except queue.Full:
+            self._count(rejected=1)
+            return False
+        self._count(queued=1)
+        return True
+
+    def stop(self, timeout=30):
+        """Hentikan thread setelah seluruh antrean tersimpan (dipanggil saat shutdown)."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(self._STOP, timeout=timeout)
+        self._thread.join(timeout)
+
+    def _collect(self):
+        item = self._queue.get()
+        if item is self._STOP:
+            return [], True
+        items = [item]
+        deadline = time.monotonic() + self.flush_interval
+        while len(items) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                return items + self._drain(), True
+            items.append(item)
+        return items, False
+
+    def _drain(self):
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is not self._STOP:
+                items.append(item)
+
+    def _save(self, items):
+        db = SessionLocal()
+        try:
+            save_detections(db, items)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _flush(self, items):
+        for start in range(0, len(items), self.max_batch):
+            chunk = items[start:start + self.max_batch]
+            try:
+                self._save(chunk)
+                self._count(flushed=len(chunk), commits=1)
+            except Exception:
+                self._count(failures=1)
+                logger.exception("Write-behind flush of %d detections failed, retrying one by one", len(chunk))
+                self._flush_individually(chunk)
+
+    def _flush_individually(self, chunk):
+        """Simpan item satu per satu agar satu row bermasalah (mis. user sudah dihapus) tidak menggagalkan yang lain."""
+        for item in chunk:
+            try:
+                self._save([item])
+                self._count(flushed=1, commits=1)
+            except Exception:
+                user_id, image_path, _ = item
+                self._count(dropped=1)
+                logger.exception("Write-behind dropped detection for user %s (%s)", user_id, image_path)
+                # Row tidak akan pernah tersimpan, jadi file upload-nya dihapus
+                if os.path.exists(image_path):
+                    os.remove(image_path)
+
+    def _run(self):
+        while True:
+            items, stopping = self._collect()
+            if items:
+                self._flush(items)
+            if stopping:
+                break
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for name, amount in increments.items():
+                self._stats[name] += amount
+
+    def stats(self):
+        with self._stats_lock:
+            counters = dict(self._stats)
+        return {
+            **counters,
+            "mode": PERSIST_MODE,
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "flush_interval": self.flush_interval,
+            "max_batch": self.max_batch,
+        }
+
+
+write_behind = WriteBehindQueue()
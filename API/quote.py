@@ -1,44 +1,78 @@
-from fastapi import Depends, status, APIRouter, HTTPException
+from fastapi import Depends, status, APIRouter, HTTPException, Request
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, validator
 from typing import List, Annotated
 from database import get_db
+from API.user import get_current_user
+from datetime import date
 from models import Quote
+from API.quote_catalog import quote_catalog
+from API.serialization import PreparedBodies, prepared_response, CATALOG_CACHE_CONTROL
 
 router = APIRouter()
 
 class QuoteCreate(BaseModel):
     QuoteText: str
     QuoteAuthor: str
+    Mood: str
 
 class QuoteResponse(BaseModel):
     QuoteText: str
     QuoteAuthor: str
     Mood: str
 
+# Body JSON siap kirim per endpoint/mood, dibuat ulang hanya saat version catalog berubah
+quote_bodies = PreparedBodies()
+
 # Endpoint untuk menambah quote
 @router.post("/quote/", response_model=QuoteCreate, status_code=status.HTTP_200_OK)
 async def create_quote(quote: QuoteCreate, db: Annotated[Session, Depends(get_db)]):
     db_quote = Quote(
         QuoteText=quote.QuoteText,
         QuoteAuthor=quote.QuoteAuthor,
+        Mood=quote.Mood,
     )
     db.add(db_quote)
     db.commit()
     db.refresh(db_quote)
+    # Langsung masuk ke daftar mood-nya, jadi bisa dipilih /quote/{mood}/random tanpa reload
+    quote_catalog.add(db, db_quote)
     return db_quote
 
-# Endpoint untuk mendapatkan semua quotes
+# Endpoint untuk mendapatkan semua quotes (dari catalog in-memory, dengan ETag)
 @router.get("/quote/", status_code=status.HTTP_200_OK)
-async def get_quotes(db: Annotated[Session, Depends(get_db)]):
-    return db.query(Quote).all()
+async def get_quotes(request: Request, db: Annotated[Session, Depends(get_db)]):
+    quote_catalog.ensure_fresh(db)
+    prepared = quote_bodies.get("all", quote_catalog.version, quote_catalog.all_quotes)
+    return prepared_response(prepared, request, CATALOG_CACHE_CONTROL)
 
 @router.get("/quote/{mood}", response_model=List[QuoteResponse], status_code=status.HTTP_200_OK)
-async def get_quotes_by_mood(mood: str, db: Annotated[Session, Depends(get_db)]):
+async def get_quotes_by_mood(mood: str, request: Request, db: Annotated[Session, Depends(get_db)]):
     # Mencari quotes yang memiliki Mood yang sesuai dengan parameter mood
-    quotes = db.query(Quote).filter(Quote.Mood == mood).all()
+    quote_catalog.ensure_fresh(db)
+    quotes = quote_catalog.quotes_for_mood(mood)
     
     if not quotes:
         raise HTTPException(status_code=404, detail=f"No quotes found for mood: {mood}")
     
-    return quotes
\ No newline at end of file
+    prepared = quote_bodies.get(f"mood:{mood}", quote_catalog.version, lambda: [
+        {field: quote[field] for field in QuoteResponse.__fields__} for quote in quotes
+    ])
+    return prepared_response(prepared, request, CATALOG_CACHE_CONTROL)
+
+# Satu quote acak untuk mood; daily=true memberi quote yang sama untuk user yang sama sepanjang hari
+@router.get("/quote/{mood}/random", response_model=QuoteResponse, status_code=status.HTTP_200_OK)
+async def get_random_quote(
+    mood: str,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: dict = Depends(get_current_user),
+    daily: bool = False,
+):
+    quote_catalog.ensure_fresh(db)
+    seed = f"{current_user.get('sub')}:{date.today().isoformat()}:{mood}" if daily else None
+    quote = quote_catalog.random_quote(mood, seed=seed)
+
+    if quote is None:
+        raise HTTPException(status_code=404, detail=f"No quotes found for mood: {mood}")
+
+    return {field: quote[field] for field in QuoteResponse.__fields__}
@@ -0,0 +1,43 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import Quote
+from API.catalog import Catalog
+import os
+import random
+
+# Interval (detik) pengecekan apakah tabel quotes diubah oleh worker lain
+QUOTE_REFRESH_INTERVAL = float(os.getenv("QUOTE_REFRESH_INTERVAL", "60"))
+
+class QuoteCatalog(Catalog):
+    """Semua quote di memori, dikelompokkan per Mood."""
+
+    model = Quote
+    key = "QuoteID"
+    refresh_interval = QUOTE_REFRESH_INTERVAL
+
+    def _signature_of(self, db: Session):
+        # Quote tidak punya UpdatedAt; jumlah row dan QuoteID terbesar cukup untuk insert/delete
+        return tuple(db.query(func.count(Quote.QuoteID), func.max(Quote.QuoteID)).one())
+
+    def _groups(self, quote: dict):
+        return [("mood", quote["Mood"])]
+
+    def add(self, db: Session, quote: Quote):
+        """Tambahkan quote yang baru di-commit tanpa memuat ulang seluruh tabel."""
+        self.refresh_ids(db, [quote.QuoteID])
+
+    def all_quotes(self):
+        return self.all_rows()
+
+    def quotes_for_mood(self, mood: str):
+        return self.rows_for("mood", mood)
+
+    def random_quote(self, mood: str, seed=None):
+        """Satu quote acak (uniform) untuk mood, tanpa query database. seed sama -> quote sama."""
+        quotes = self.quotes_for_mood(mood)
+        if not quotes:
+            return None
+        rng = random.Random(seed) if seed is not None else random
+        return quotes[rng.randrange(len(quotes))]
+
+quote_catalog = QuoteCatalog()
@@ -0,0 +1,124 @@
+from API.aggregates import SCORE_COLUMNS
+from API.music_catalog import mood_mapping, music_catalog
+from bisect import bisect_right
+from itertools import accumulate
+import secrets
+import threading
+import numpy as np
+
+# Urutan kolom sama dengan Enum MoodClassification di models.MusicDataset
+MOOD_CLASSIFICATIONS = ["Sad", "Calm", "Energetic", "Happy"]
+EMOTIONS = list(SCORE_COLUMNS)
+
+def build_mood_matrix():
+    """Matriks (emosi x MoodClassification) dari mood_mapping; tiap baris dibagi rata ke kelas yang dipetakan."""
+    matrix = np.zeros((len(EMOTIONS), len(MOOD_CLASSIFICATIONS)), dtype=np.float64)
+    for row, emotion in enumerate(EMOTIONS):
+        classifications = mood_mapping[emotion.lower()]
+        for classification in classifications:
+            matrix[row, MOOD_CLASSIFICATIONS.index(classification)] = 1.0 / len(classifications)
+    return matrix
+
+MOOD_MATRIX = build_mood_matrix()
+
+def score_vector(analysis):
+    """Vektor tujuh skor (urut EMOTIONS) dari payload ExpressionAnalysis; tanpa skor dianggap Neutral."""
+    analysis = analysis or {}
+    scores = np.array([analysis.get(SCORE_COLUMNS[emotion]) or 0.0 for emotion in EMOTIONS], dtype=np.float64)
+    if scores.sum() <= 0:
+        scores[EMOTIONS.index("Neutral")] = 1.0
+    return scores / scores.sum()
+
+def classification_weights(scores):
+    """Bobot per MoodClassification (jumlahnya 1) dari vektor skor emosi."""
+    return scores @ MOOD_MATRIX
+
+# Percobaan acak sebelum beralih ke daftar lagu yang belum dipakai (kelas yang hampir habis)
+MAX_REJECTIONS = 16
+
+def pick_unused(members, used, draws):
+    """Posisi acak (uniform) dari members yang belum ada di used; draws adalah iterator bilangan acak [0, 1)."""
+    for _ in range(MAX_REJECTIONS):
+        position = members[int(next(draws) * len(members))]
+        if position not in used:
+            return position
+    candidates = [position for position in members if position not in used]
+    return candidates[int(next(draws) * len(candidates))]
+
+def random_draws(rng, batch):
+    """Bilangan acak [0, 1) dari rng, diambil per batch agar tidak ada panggilan NumPy per angka."""
+    while True:
+        yield from rng.random(batch).tolist()
+
+def rank_songs(class_weights, class_members, class_index, limit, rng, exclude_positions=()):
+    """Sampling top-N tanpa pengembalian: tiap slot memilih kelas sesuai bobotnya, lalu satu lagu acak di kelas itu.
+
+    Porsi tiap MoodClassification di hasil mengikuti bobotnya, bukan jumlah lagunya. class_members
+    berisi list posisi lagu per kelas (urut MOOD_CLASSIFICATIONS), class_index indeks kelas per posisi
+    (len(MOOD_CLASSIFICATIONS) untuk lagu tanpa klasifikasi). Biayanya O(limit + len(exclude_positions)),
+    tidak bergantung ukuran catalog. Mengembalikan posisi lagu dalam array catalog, urut pilihan.
+    """
+    used = set(exclude_positions)
+    remaining = [len(members) for members in class_members]
+    for position in used:
+        if class_index[position] < len(remaining):
+            remaining[class_index[position]] -= 1
+    weights = [float(w) if n > 0 else 0.0 for w, n in zip(class_weights, remaining)]
+    cumulative = list(accumulate(weights))
+    draws = random_draws(rng, 2 * limit + 2)
+
+    picks = []
+    while len(picks) < limit and cumulative[-1] > 0:
+        chosen = min(bisect_right(cumulative, next(draws) * cumulative[-1]), len(weights) - 1)
+        position = pick_unused(class_members[chosen], used, draws)
+        used.add(position)
+        picks.append(position)
+        remaining[chosen] -= 1
+        if remaining[chosen] == 0:
+            # Kelas habis: bobotnya tidak lagi ikut diundi
+            weights[chosen] = 0.0
+            cumulative = list(accumulate(weights))
+    return picks
+
+class CatalogArrays:
+    """Posisi lagu per kelas dari music_catalog, dibangun ulang saat version berubah."""
+
+    def __init__(self):
+        self._snapshot = (None, [], {}, [[] for _ in MOOD_CLASSIFICATIONS], np.empty(0, dtype=np.intp))
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """(version, songs, positions, class_members, class_index) yang konsisten satu sama lain.
+
+        positions memetakan MusicID ke posisi di songs.
+        """
+        with self._lock:
+            if self._snapshot[0] != music_catalog.version:
+                version = music_catalog.version
+                songs = music_catalog.all_songs()
+                lookup = {classification: i for i, classification in enumerate(MOOD_CLASSIFICATIONS)}
+                positions = {song["MusicID"]: i for i, song in enumerate(songs)}
+                class_index = np.fromiter(
+                    (lookup.get(song["MoodClassification"], len(MOOD_CLASSIFICATIONS)) for song in songs),
+                    dtype=np.intp, count=len(songs),
+                )
+                class_members = [np.flatnonzero(class_index == i).tolist() for i in range(len(MOOD_CLASSIFICATIONS))]
+                self._snapshot = (version, songs, positions, class_members, class_index)
+            return self._snapshot
+
+catalog_arrays = CatalogArrays()
+
+def recommend(analysis, limit, seed=None, exclude=None):
+    """Rekomendasi lagu dari payload ExpressionAnalysis terbaru. seed sama -> urutan sama (untuk catalog yang sama)."""
+    version, songs, positions, class_members, class_index = catalog_arrays.snapshot()
+    if seed is None:
+        seed = secrets.randbits(32)
+    weights = classification_weights(score_vector(analysis))
+    excluded = [positions[music_id] for music_id in exclude or () if music_id in positions]
+    picks = rank_songs(weights, class_members, class_index, limit, np.random.default_rng(seed), excluded)
+    return {
+        "CatalogVersion": version,
+        "Seed": seed,
+        "MoodWeights": {classification: float(w) for classification, w in zip(MOOD_CLASSIFICATIONS, weights)},
+        "songs": [songs[i] for i in picks],
+    }
@@ -0,0 +1,87 @@
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import orjson
+except ImportError:  # orjson opsional; tanpa itu dipakai json standar
+    orjson = None
+
+# Lama (detik) client boleh memakai catalog quote/musik tanpa revalidasi ETag
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", "60"))
+CATALOG_CACHE_CONTROL = f"public, max-age={CATALOG_CACHE_MAX_AGE}"
+
+# Body lebih kecil dari ini tidak dikompres (overhead gzip tidak sebanding)
+GZIP_MIN_SIZE = 1024
+
+def dumps(payload) -> bytes:
+    """Encode JSON secepat mungkin: orjson jika terpasang, selain itu json tanpa spasi."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+def row_payload(row) -> dict:
+    """Semua kolom row ORM sebagai dict JSON, sama seperti response ORM."""
+    return jsonable_encoder({column.name: getattr(row, column.name) for column in row.__table__.columns})
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
+
+def json_response(body: bytes, request: Request, status_code: int = 200, headers: dict = None) -> Response:
+    """Response JSON dari body yang sudah di-encode, dikompres gzip jika client menerimanya."""
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept-Encoding"
+    if len(body) >= GZIP_MIN_SIZE and accepts_gzip(request):
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+class PreparedBody:
+    """Body JSON yang di-encode dan dikompres sekali, beserta ETag dari isinya (sama di semua worker)."""
+
+    def __init__(self, payload):
+        self.body = dumps(payload)
+        self.gzip_body = gzip.compress(self.body, compresslevel=9) if len(self.body) >= GZIP_MIN_SIZE else None
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()[:20]}"'
+
+class PreparedBodies:
+    """Simpan PreparedBody per key selama version sumbernya tidak berubah."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, build):
+        """Ambil body untuk key; build() dipanggil untuk membuat payload jika version sudah berbeda."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        prepared = PreparedBody(build())
+        with self._lock:
+            self._entries[key] = (version, prepared)
+        return prepared
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    # Perbandingan lemah: W/"x" dianggap sama dengan "x" (misalnya setelah proxy mengompres ulang)
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def prepared_response(prepared: PreparedBody, request: Request, cache_control: str, headers: dict = None) -> Response:
+    """Response dari PreparedBody: 304 jika ETag cocok, selain itu body (gzip jika diterima client)."""
+    headers = dict(headers or {})
+    headers.update({"ETag": prepared.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"})
+    if etag_matches(request, prepared.etag):
+        return Response(status_code=304, headers=headers)
+    if prepared.gzip_body is not None and accepts_gzip(request):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=prepared.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=prepared.body, media_type="application/json", headers=headers)
@@ -9,6 +9,7 @@ from pydantic import BaseModel
 from typing import Annotated, Optional
 from models import User
 from database import get_db
+from API.cache import upload_dedupe_cache, latest_expression_cache
 from passlib.context import CryptContext
 from dotenv import load_dotenv
 import jwt
@@ -346,6 +347,10 @@ async def delete_user_account(
     db.delete(user)
     db.commit()
 
+    # Buang data user ini dari cache dedupe upload dan cache expression terbaru
+    upload_dedupe_cache.delete_prefix(f"{user_id}:")
+    latest_expression_cache.delete(str(user_id))
+
     return {"message": "Account and related data deleted successfully"}
 
 # endpoint get avatar by user id
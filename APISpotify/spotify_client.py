@@ -0,0 +1,169 @@
+import asyncio
+import base64
+import logging
+import os
+import time
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
+CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
+
+# Base URL bisa diarahkan ke server tiruan lokal untuk benchmark
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1")
+SPOTIFY_TOKEN_URL = os.getenv("SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token")
+# Endpoint multi-track menerima maksimal 50 ID per request
+SPOTIFY_BATCH_SIZE = min(int(os.getenv("SPOTIFY_BATCH_SIZE", "50")), 50)
+SPOTIFY_CONCURRENCY = int(os.getenv("SPOTIFY_CONCURRENCY", "4"))
+SPOTIFY_MAX_RETRIES = int(os.getenv("SPOTIFY_MAX_RETRIES", "5"))
+SPOTIFY_TIMEOUT = float(os.getenv("SPOTIFY_TIMEOUT", "10"))
+# Batas tunggu per retry (detik), juga untuk Retry-After yang terlalu besar
+SPOTIFY_MAX_RETRY_WAIT = float(os.getenv("SPOTIFY_MAX_RETRY_WAIT", "30"))
+# Token diperbarui sekian detik sebelum expires_in habis
+SPOTIFY_TOKEN_EXPIRY_MARGIN = float(os.getenv("SPOTIFY_TOKEN_EXPIRY_MARGIN", "60"))
+
+def retry_after(response, default):
+    """Nilai header Retry-After (detik); default jika tidak ada atau bukan angka."""
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return default
+
+class SpotifyClient:
+    """Client async ke Web API Spotify dengan connection pool bersama dan concurrency terbatas."""
+
+    def __init__(self, api_url=SPOTIFY_API_URL, token_url=SPOTIFY_TOKEN_URL, concurrency=SPOTIFY_CONCURRENCY):
+        self.api_url = api_url.rstrip("/")
+        self.token_url = token_url
+        self.concurrency = concurrency
+        self._client = None
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = None
+        self.token_fetches = 0
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _http(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=SPOTIFY_TIMEOUT,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(self, method, url, **kwargs):
+        """Kirim request; 429 menunggu sesuai Retry-After, 5xx dan error jaringan memakai backoff eksponensial."""
+        for attempt in range(SPOTIFY_MAX_RETRIES + 1):
+            self.requests += 1
+            try:
+                response = await self._http().request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt == SPOTIFY_MAX_RETRIES:
+                    raise
+                wait = min(2 ** attempt, SPOTIFY_MAX_RETRY_WAIT)
+            else:
+                if response.status_code == 429:
+                    self.rate_limited += 1
+                    wait = min(retry_after(response, 2 ** attempt), SPOTIFY_MAX_RETRY_WAIT)
+                elif response.status_code >= 500:
+                    wait = min(2 ** attempt, SPOTIFY_MAX_RETRY_WAIT)
+                else:
+                    return response
+                if attempt == SPOTIFY_MAX_RETRIES:
+                    return response
+            self.retries += 1
+            logger.warning("Spotify %s %s failed, retrying in %.1fs", method, url, wait)
+            await asyncio.sleep(wait)
+
+    async def get_token(self):
+        """Token client-credentials yang di-cache sampai mendekati expires_in; satu fetch untuk request bersamaan."""
+        if self._token is not None and time.monotonic() < self._token_expires_at:
+            return self._token
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            if self._token is None or time.monotonic() >= self._token_expires_at:
+                token_data = await self._fetch_token()
+                self._token = token_data["access_token"]
+                expires_in = float(token_data.get("expires_in", 3600))
+                self._token_expires_at = time.monotonic() + max(expires_in - SPOTIFY_TOKEN_EXPIRY_MARGIN, 0)
+            return self._token
+
+    def invalidate_token(self):
+        self._token = None
+
+    async def _fetch_token(self):
+        self.token_fetches += 1
+        auth_base64 = base64.b64encode(f"{CLIENT_ID}:{CLIENT_SECRET}".encode("utf-8")).decode("utf-8")
+        response = await self._request(
+            "POST",
+            self.token_url,
+            data={"grant_type": "client_credentials"},
+            headers={"Authorization": "Basic " + auth_base64},
+        )
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail="Error fetching token from Spotify")
+        return response.json()
+
+    async def get_several_tracks(self, token, track_ids):
+        """Satu request multi-track (maksimal 50 ID). Track yang tidak ditemukan bernilai None."""
+        response = await self._request(
+            "GET",
+            f"{self.api_url}/tracks",
+            params={"ids": ",".join(track_ids)},
+            headers={"Authorization": "Bearer " + token},
+        )
+        if response.status_code == 401:
+            # Token dicabut atau kedaluwarsa lebih cepat dari expires_in; fetch ulang pada panggilan berikutnya
+            self.invalidate_token()
+            raise HTTPException(status_code=502, detail="Spotify rejected the access token")
+        if response.status_code == 400:
+            # Ada ID yang tidak valid; satu ID buruk tidak boleh menggagalkan 49 lainnya
+            return {track_id: await self.get_track(token, track_id) for track_id in track_ids}
+        if response.status_code != 200:
+            raise HTTPException(status_code=502, detail=f"Spotify returned {response.status_code} for tracks")
+        tracks = response.json().get("tracks", [])
+        return {track_id: track for track_id, track in zip(track_ids, tracks)}
+
+    async def get_track(self, token, track_id):
+        response = await self._request(
+            "GET", f"{self.api_url}/tracks/{track_id}", headers={"Authorization": "Bearer " + token}
+        )
+        return response.json() if response.status_code == 200 else None
+
+    async def fetch_tracks(self, token, track_ids):
+        """Ambil banyak track sekaligus: dipecah per SPOTIFY_BATCH_SIZE, paling banyak `concurrency` batch paralel."""
+        track_ids = list(dict.fromkeys(track_ids))
+        batches = [track_ids[i:i + SPOTIFY_BATCH_SIZE] for i in range(0, len(track_ids), SPOTIFY_BATCH_SIZE)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(batch):
+            async with semaphore:
+                return await self.get_several_tracks(token, batch)
+
+        results = {}
+        for batch_result in await asyncio.gather(*(fetch(batch) for batch in batches)):
+            results.update(batch_result)
+        return results
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "token_fetches": self.token_fetches,
+        }
+
+spotify_client = SpotifyClient()
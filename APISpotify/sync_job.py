@@ -0,0 +1,289 @@
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import MusicDataset, SpotifySyncJob
+from API.music_catalog import music_catalog
+from API.cache import SQLiteCache
+from API.serialization import row_payload
+from APISpotify.spotify_client import spotify_client
+import asyncio
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Jumlah lagu per chunk; setiap chunk di-commit bersama checkpoint-nya
+SPOTIFY_SYNC_CHUNK_SIZE = int(os.getenv("SPOTIFY_SYNC_CHUNK_SIZE", "200"))
+# Job "running" yang tidak memperbarui checkpoint selama ini dianggap mati (crash/restart) dan boleh dilanjutkan
+SPOTIFY_SYNC_STALE_SECONDS = float(os.getenv("SPOTIFY_SYNC_STALE_SECONDS", "300"))
+# Cache lokal metadata track per SpotifyID; track yang masih fresh tidak diminta lagi ke Spotify
+SPOTIFY_TRACK_CACHE_PATH = os.getenv("SPOTIFY_TRACK_CACHE_PATH", "images/spotify-track-cache.sqlite3")
+SPOTIFY_TRACK_CACHE_TTL = float(os.getenv("SPOTIFY_TRACK_CACHE_TTL", str(7 * 24 * 3600)))
+SPOTIFY_TRACK_CACHE_SIZE = int(os.getenv("SPOTIFY_TRACK_CACHE_SIZE", "200000"))
+
+_track_cache = None
+_track_cache_lock = threading.Lock()
+
+def get_track_cache():
+    """Cache metadata track, dibuka saat sync pertama (import modul tidak membuat file)."""
+    global _track_cache
+    if _track_cache is None:
+        with _track_cache_lock:
+            if _track_cache is None:
+                directory = os.path.dirname(SPOTIFY_TRACK_CACHE_PATH)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                _track_cache = SQLiteCache(SPOTIFY_TRACK_CACHE_PATH, max_entries=SPOTIFY_TRACK_CACHE_SIZE, ttl=SPOTIFY_TRACK_CACHE_TTL)
+    return _track_cache
+
+def format_duration(ms):
+    seconds = ms // 1000
+    minutes = seconds // 60
+    seconds %= 60
+    return f"{minutes}:{seconds:02d}"
+
+def track_fields(track_data):
+    """Kolom MusicDataset dari data track Spotify, atau None jika ada data penting yang kosong."""
+    images = track_data.get("album", {}).get("images", [])
+    if not all([
+        track_data.get("name"),
+        track_data.get("album", {}).get("name"),
+        track_data.get("artists"),
+        track_data.get("external_urls", {}).get("spotify"),
+        images  # Pastikan images tidak kosong
+    ]):
+        return None
+    return {
+        "MusicTitle": track_data.get("name"),
+        "MusicAlbum": track_data.get("album", {}).get("name"),
+        "MusicArtist": ", ".join([artist.get("name") for artist in track_data.get("artists", [])]),
+        "ReleaseDate": track_data.get("album", {}).get("release_date", "")[:4],
+        "SongUrl": track_data.get("external_urls", {}).get("spotify"),
+        "ImageUrl": images[0].get("url"),
+        "Duration": format_duration(track_data.get("duration_ms", 0)),
+    }
+
+def pending_songs(db: Session, after_music_id: int, full_refresh: bool = False):
+    """Lagu yang perlu di-sync setelah checkpoint, urut MusicID.
+
+    Default hanya lagu tanpa SongUrl; full_refresh mengambil semua lagu yang punya SpotifyID.
+    """
+    if full_refresh:
+        condition = (MusicDataset.SpotifyID != None) & (MusicDataset.SpotifyID != "")
+    else:
+        condition = (MusicDataset.SongUrl == None) | (MusicDataset.SongUrl == "")
+    return db.query(MusicDataset).filter(condition, MusicDataset.MusicID > after_music_id).order_by(MusicDataset.MusicID)
+
+# Status job yang belum selesai; cancel_requested berhenti setelah chunk berjalan di-commit
+ACTIVE_STATUSES = ("running", "cancel_requested")
+
+def is_stale(job: SpotifySyncJob) -> bool:
+    return job.UpdatedAt is None or datetime.now() - job.UpdatedAt > timedelta(seconds=SPOTIFY_SYNC_STALE_SECONDS)
+
+class SpotifySyncRunner:
+    """Menjalankan sync Spotify sebagai task background per chunk, dengan checkpoint di tabel spotify_sync_jobs."""
+
+    def __init__(self):
+        self.job_id = None
+        self._task = None
+        self._cancel = False
+        self._started_at = None
+        self._ended_at = None
+        self._processed_this_run = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def _blocking_job(self, db: Session):
+        """Job lain yang masih aktif (di proses ini atau worker lain dengan checkpoint baru)."""
+        jobs = db.query(SpotifySyncJob).filter(SpotifySyncJob.Status.in_(ACTIVE_STATUSES)).all()
+        for job in jobs:
+            if (self.running and job.JobID == self.job_id) or not is_stale(job):
+                return job
+        return None
+
+    def start(self, db: Session, resume: bool = False, full_refresh: bool = False):
+        """Mulai job baru, atau lanjutkan job terbaru jika belum selesai. Mengembalikan row job, None jika tidak ada yang dilanjutkan."""
+        if self._blocking_job(db) is not None:
+            raise RuntimeError("A Spotify sync job is already running")
+
+        if resume:
+            # Hanya job terbaru yang boleh dilanjutkan; job lama sudah digantikan job sesudahnya
+            job = db.query(SpotifySyncJob).order_by(SpotifySyncJob.JobID.desc()).first()
+            if job is None or job.Status == "completed":
+                return None
+            job.Status = "running"
+            job.Error = None
+            job.FinishedAt = None
+        else:
+            # Job lama yang mati di tengah jalan ditandai cancelled (masih bisa dilihat, tidak dilanjutkan)
+            db.query(SpotifySyncJob).filter(SpotifySyncJob.Status.in_(ACTIVE_STATUSES)).update(
+                {"Status": "cancelled", "FinishedAt": datetime.now()}, synchronize_session=False
+            )
+            job = SpotifySyncJob(Status="running", FullRefresh=full_refresh, LastMusicID=0, StartedAt=datetime.now())
+            db.add(job)
+            db.flush()
+            job.Total = pending_songs(db, 0, full_refresh).count()
+        job.UpdatedAt = datetime.now()
+        db.commit()
+        db.refresh(job)
+
+        self.job_id = job.JobID
+        self._cancel = False
+        self._started_at = time.monotonic()
+        self._ended_at = None
+        self._processed_this_run = 0
+        self._task = asyncio.ensure_future(self._run(job.JobID))
+        return job
+
+    def cancel(self, db: Session):
+        """Minta job berhenti setelah chunk yang sedang berjalan selesai di-commit.
+
+        Permintaan disimpan di database sehingga job yang berjalan di worker lain juga berhenti.
+        """
+        job = self._blocking_job(db)
+        if job is None:
+            return None
+        job.Status = "cancel_requested"
+        # Jam aplikasi, sama seperti checkpoint lain yang dibandingkan is_stale
+        job.UpdatedAt = datetime.now()
+        db.commit()
+        if job.JobID == self.job_id:
+            self._cancel = True
+        return job
+
+    def _load_chunk(self, job_id):
+        """Chunk berikutnya setelah checkpoint, atau None jika job diminta berhenti dari worker lain."""
+        db = SessionLocal()
+        try:
+            job = db.get(SpotifySyncJob, job_id)
+            if job.Status == "cancel_requested":
+                return None
+            songs = pending_songs(db, job.LastMusicID, job.FullRefresh).limit(SPOTIFY_SYNC_CHUNK_SIZE).all()
+            return [(song.MusicID, song.SpotifyID) for song in songs]
+        finally:
+            db.close()
+
+    def _store_fetched(self, fetched):
+        """Ubah hasil fetch menjadi kolom MusicDataset; yang valid disimpan ke cache lokal."""
+        fresh = {spotify_id: track_fields(track) for spotify_id, track in fetched.items() if track}
+        fresh = {spotify_id: fields for spotify_id, fields in fresh.items() if fields is not None}
+        if fresh:
+            get_track_cache().set_many(fresh)
+        return fresh
+
+    def _cached_fields(self, spotify_ids):
+        cached = get_track_cache().get_many(spotify_ids)
+        self.cache_hits += len(cached)
+        self.cache_misses += len(spotify_ids) - len(cached)
+        return cached
+
+    def _apply_chunk(self, job_id, music_ids, tracks):
+        """Terapkan metadata (SpotifyID -> kolom) ke satu chunk dan simpan checkpoint dalam transaksi yang sama.
+
+        Hanya row yang nilainya benar-benar berubah yang di-update. Mengembalikan hasil
+        music_catalog.fetch_ids untuk lagu yang berubah, diterapkan ke catalog di event loop.
+        """
+        db = SessionLocal()
+        try:
+            job = db.get(SpotifySyncJob, job_id)
+            songs = db.query(MusicDataset).filter(MusicDataset.MusicID.in_(music_ids)).all()
+            changed_ids = []
+            for music in songs:
+                if not music.SpotifyID:
+                    continue  # Skip jika SpotifyID kosong
+                fields = tracks.get(music.SpotifyID)
+                if fields is None:
+                    # Track tidak ditemukan atau ada data yang null, hapus baris dari database
+                    changed_ids.append(music.MusicID)
+                    db.delete(music)
+                    job.Removed += 1
+                    continue
+                changes = {column: value for column, value in fields.items() if getattr(music, column) != value}
+                if not changes:
+                    job.Unchanged += 1
+                    continue  # Skip pembaruan jika tidak ada perubahan
+                for column, value in changes.items():
+                    setattr(music, column, value)
+                changed_ids.append(music.MusicID)
+                job.Updated += 1
+
+            job.LastMusicID = max(music_ids)
+            job.Processed += len(music_ids)
+            job.UpdatedAt = datetime.now()
+            db.commit()
+            return music_catalog.fetch_ids(db, changed_ids)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _finish(self, job_id, status, error=None):
+        db = SessionLocal()
+        try:
+            job = db.get(SpotifySyncJob, job_id)
+            job.Status = status
+            job.Error = error
+            job.UpdatedAt = job.FinishedAt = datetime.now()
+            db.commit()
+        finally:
+            db.close()
+
+    async def _run(self, job_id):
+        loop = asyncio.get_running_loop()
+        try:
+            while not self._cancel:
+                chunk = await loop.run_in_executor(None, self._load_chunk, job_id)
+                if chunk is None:
+                    break
+                if not chunk:
+                    await loop.run_in_executor(None, self._finish, job_id, "completed")
+                    return
+                spotify_ids = list({spotify_id for _, spotify_id in chunk if spotify_id})
+                tracks = await loop.run_in_executor(None, self._cached_fields, spotify_ids)
+                missing = [spotify_id for spotify_id in spotify_ids if spotify_id not in tracks]
+                if missing:
+                    # Token di-cache sampai mendekati expires_in, jadi aman diminta per chunk
+                    token = await spotify_client.get_token()
+                    fetched = await spotify_client.fetch_tracks(token, missing)
+                    tracks.update(await loop.run_in_executor(None, self._store_fetched, fetched))
+                refreshed = await loop.run_in_executor(
+                    None, self._apply_chunk, job_id, [music_id for music_id, _ in chunk], tracks
+                )
+                music_catalog.apply(*refreshed)
+                self._processed_this_run += len(chunk)
+            await loop.run_in_executor(None, self._finish, job_id, "cancelled")
+        except Exception as e:
+            logger.exception("Spotify sync job %s failed", job_id)
+            await loop.run_in_executor(None, self._finish, job_id, "failed", str(e))
+        finally:
+            self._ended_at = time.monotonic()
+
+    def status(self, db: Session):
+        # Job terbaru, termasuk yang dijalankan worker lain
+        job = db.query(SpotifySyncJob).order_by(SpotifySyncJob.JobID.desc()).first()
+        if job is None:
+            return None
+        payload = row_payload(job)
+        payload["ActiveInThisWorker"] = self.running and job.JobID == self.job_id
+        if job.JobID == self.job_id and self._started_at is not None:
+            elapsed = (self._ended_at or time.monotonic()) - self._started_at
+            payload["SongsPerSecond"] = self._processed_this_run / elapsed if elapsed > 0 else 0.0
+        payload["Remaining"] = max(job.Total - job.Processed, 0)
+        payload["spotify"] = spotify_client.stats()
+        payload["track_cache"] = {"hits": self.cache_hits, "misses": self.cache_misses}
+        return payload
+
+    async def stop(self):
+        """Saat shutdown: hentikan setelah chunk berjalan; job tetap bisa dilanjutkan dengan resume."""
+        if self.running:
+            self._cancel = True
+            await self._task
+
+spotify_sync = SpotifySyncRunner()
@@ -0,0 +1,108 @@
+"""Bandingkan deteksi wajah resolusi penuh dengan mode cepat (downscale + minSize adaptif).
+
+Jalankan dari root repo (butuh .env yang sama dengan aplikasi):
+
+    python -m benchmarks.face_detection --images path/ke/folder-foto --repeat 3
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from API.face_detection import decode_grayscale, detect_faces_full, detect_faces_fast, FACE_DETECT_MAX_SIDE, FACE_DETECT_MIN_FACE_RATIO
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    inter_w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    inter_h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = inter_w * inter_h
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+def time_call(func, gray, repeat):
+    durations = []
+    faces = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        faces = func(gray)
+        durations.append((time.perf_counter() - started) * 1000.0)
+    return faces, min(durations)
+
+def summarize(latencies, hits, total):
+    latencies = np.asarray(latencies)
+    return {
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "hit_rate": hits / total,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Folder berisi foto sampel")
+    parser.add_argument("--repeat", type=int, default=3, help="Jumlah pengulangan per gambar (diambil yang tercepat)")
+    parser.add_argument("--max-side", type=int, default=FACE_DETECT_MAX_SIDE)
+    parser.add_argument("--min-face-ratio", type=float, default=FACE_DETECT_MIN_FACE_RATIO)
+    parser.add_argument("--json", help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.images, name)
+        for name in os.listdir(args.images)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    )
+    if not paths:
+        parser.error(f"No images found in {args.images}")
+
+    fast = lambda gray: detect_faces_fast(gray, args.max_side, args.min_face_ratio)
+    full_latencies, fast_latencies = [], []
+    full_hits = fast_hits = agreements = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            gray = decode_grayscale(f.read())
+        if gray is None:
+            print(f"skip {path}: not a valid image")
+            continue
+
+        full_faces, full_ms = time_call(detect_faces_full, gray, args.repeat)
+        fast_faces, fast_ms = time_call(fast, gray, args.repeat)
+        full_latencies.append(full_ms)
+        fast_latencies.append(fast_ms)
+        full_hits += len(full_faces) > 0
+        fast_hits += len(fast_faces) > 0
+
+        # Wajah pertama mode cepat dianggap cocok jika overlap dengan salah satu wajah resolusi penuh
+        if len(full_faces) and len(fast_faces):
+            if max(iou(fast_faces[0], face) for face in full_faces) >= 0.5:
+                agreements += 1
+
+    total = len(full_latencies)
+    if not total:
+        parser.error(f"No readable images in {args.images}")
+    results = {
+        "images": total,
+        "max_side": args.max_side,
+        "min_face_ratio": args.min_face_ratio,
+        "full": summarize(full_latencies, full_hits, total),
+        "fast": summarize(fast_latencies, fast_hits, total),
+        "first_face_agreement": agreements / full_hits if full_hits else None,
+    }
+    results["speedup"] = results["full"]["mean_ms"] / results["fast"]["mean_ms"]
+
+    print(f"{'mode':<6}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'hit rate':>10}")
+    for mode in ("full", "fast"):
+        row = results[mode]
+        print(f"{mode:<6}{row['mean_ms']:>10.2f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['hit_rate']:>10.2%}")
+    print(f"speedup: {results['speedup']:.2f}x over {total} images")
+    if results["first_face_agreement"] is not None:
+        print(f"first face agreement (IoU >= 0.5): {results['first_face_agreement']:.2%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Bandingkan varian model (float32, float16, int8): akurasi per kelas, latency p50/p99 dan memori.
+
+Folder berlabel berisi satu subfolder per kelas labels_dict (Angry, Disgust, Fear, Happy,
+Neutral, Sad, Surprise). Jalankan dari root repo (butuh .env):
+
+    python -m benchmarks.model_variants --images path/ke/dataset-berlabel
+    python -m benchmarks.model_variants --images path/ke/fer-crops --no-detect
+
+Gunakan --no-detect jika gambar sudah berupa crop wajah (misalnya dataset FER 48x48).
+"""
+import argparse
+import json
+import os
+import resource
+import time
+import cv2
+import numpy as np
+from API.face_detection import decode_grayscale, detect_faces, prepare_face
+from API.inference import BatchInterpreter, MODEL_VARIANTS
+from API.persistence import labels_dict
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+def load_samples(root, detect):
+    """Muat (label_index, tensor wajah) dari folder berlabel. Gambar tanpa wajah dilewati."""
+    label_indexes = {label.lower(): index for index, label in labels_dict.items()}
+    samples, skipped = [], 0
+    for folder in sorted(os.listdir(root)):
+        label_index = label_indexes.get(folder.lower())
+        folder_path = os.path.join(root, folder)
+        if label_index is None or not os.path.isdir(folder_path):
+            continue
+        for name in sorted(os.listdir(folder_path)):
+            if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            with open(os.path.join(folder_path, name), "rb") as f:
+                gray = decode_grayscale(f.read())
+            if gray is None:
+                skipped += 1
+                continue
+            if detect:
+                faces = detect_faces(gray)
+                if len(faces) == 0:
+                    skipped += 1
+                    continue
+                face = prepare_face(gray, faces[0])
+            else:
+                face = cv2.resize(gray, (48, 48)) / 255.0
+            samples.append((label_index, np.reshape(face, (1, 48, 48, 1)).astype(np.float32)))
+    return samples, skipped
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def evaluate(model_path, samples):
+    rss_before = max_rss_mb()
+    model = BatchInterpreter(model_path)
+    model.predict(samples[0][1])  # Warm-up, tidak dihitung
+    rss_after = max_rss_mb()
+
+    latencies = []
+    correct = np.zeros(len(labels_dict), dtype=int)
+    total = np.zeros(len(labels_dict), dtype=int)
+    for label_index, face in samples:
+        started = time.perf_counter()
+        result = model.predict(face)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+        total[label_index] += 1
+        correct[label_index] += int(np.argmax(result[0]) == label_index)
+
+    return {
+        "model_path": model_path,
+        "model_size_mb": os.path.getsize(model_path) / (1024.0 * 1024.0),
+        # Kenaikan peak RSS saat interpreter dibuat; varian yang diuji belakangan bisa tercatat lebih kecil
+        "rss_increase_mb": rss_after - rss_before,
+        "input_dtype": np.dtype(model.input_dtype).name,
+        "accuracy": float(correct.sum() / total.sum()),
+        "per_class_accuracy": {
+            labels_dict[i]: (float(correct[i] / total[i]) if total[i] else None)
+            for i in range(len(labels_dict))
+        },
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Folder berlabel (satu subfolder per kelas)")
+    parser.add_argument("--variants", nargs="+", default=list(MODEL_VARIANTS), choices=list(MODEL_VARIANTS))
+    parser.add_argument("--no-detect", action="store_true", help="Gambar sudah berupa crop wajah")
+    parser.add_argument("--json", help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    samples, skipped = load_samples(args.images, detect=not args.no_detect)
+    if not samples:
+        parser.error(f"No labelled faces found in {args.images}")
+    print(f"{len(samples)} samples ({skipped} skipped)")
+
+    results = {}
+    for variant in args.variants:
+        model_path = MODEL_VARIANTS[variant]
+        if not os.path.exists(model_path):
+            print(f"{variant}: {model_path} not found, skipped")
+            continue
+        results[variant] = evaluate(model_path, samples)
+
+    header = f"{'variant':<9}{'acc':>7}{'p50 ms':>9}{'p99 ms':>9}{'size MB':>9}{'RSS MB':>8}"
+    print(header + "".join(f"{label[:7]:>9}" for label in labels_dict.values()))
+    for variant, row in results.items():
+        line = (
+            f"{variant:<9}{row['accuracy']:>7.2%}{row['p50_ms']:>9.3f}{row['p99_ms']:>9.3f}"
+            f"{row['model_size_mb']:>9.2f}{row['rss_increase_mb']:>8.1f}"
+        )
+        for label in labels_dict.values():
+            accuracy = row["per_class_accuracy"][label]
+            line += f"{accuracy:>9.2%}" if accuracy is not None else f"{'-':>9}"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Benchmark per tahap pipeline detect_and_upload dengan output JSON untuk dibandingkan antar deploy.
+
+Tahap yang diukur: decode, konversi grayscale, deteksi cascade (penuh dan cepat),
+crop/resize/normalize, invoke TFLite, dan persistensi ke database SQLite lokal.
+Setelah itu throughput end-to-end diukur pada beberapa level concurrency.
+
+Jalankan dari root repo:
+
+    python -m benchmarks.pipeline --images images/user-faces --output bench_pipeline.json
+
+Tanpa --images dipakai gambar sintetis (cascade kemungkinan tidak menemukan wajah;
+tahap crop dan invoke tetap diukur memakai box di tengah gambar).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import tempfile
+import time
+
+# Database benchmark harus sudah diset sebelum modul aplikasi di-import
+_db_dir = tempfile.mkdtemp(prefix="moodify-bench-")
+os.environ["URL_DATABASE"] = f"sqlite:///{os.path.join(_db_dir, 'bench.sqlite3')}"
+
+import cv2
+import numpy as np
+from database import Base, engine, SessionLocal
+from models import Image, ExpressionAnalysis
+from API.face_detection import decode_grayscale, detect_faces_full, detect_faces_fast, prepare_face
+from API.inference import BatchInterpreter, InterpreterPool, InferenceScheduler, executor, MODEL_PATH
+from API.persistence import save_detections, analysis_scores
+
+RESOLUTIONS = [(640, 480), (1280, 960), (1920, 1440), (4032, 3024)]
+CONCURRENCY_LEVELS = [1, 2, 4, 8, 16]
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+def synthetic_image(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (0, 0), 5)
+    cv2.ellipse(frame, (width // 2, height // 2), (width // 6, height // 4), 0, 0, 360, (180, 160, 150), -1)
+    return frame
+
+def build_inputs(images_dir):
+    """Buat daftar JPEG (bytes) per resolusi, dari folder sampel atau sintetis."""
+    sources = []
+    if images_dir:
+        for name in sorted(os.listdir(images_dir)):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                frame = cv2.imread(os.path.join(images_dir, name))
+                if frame is not None:
+                    sources.append(frame)
+    if not sources:
+        sources = [synthetic_image(640, 480, seed) for seed in range(3)]
+
+    inputs = {}
+    for width, height in RESOLUTIONS:
+        encoded = []
+        for frame in sources:
+            resized = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            encoded.append(cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+        inputs[f"{width}x{height}"] = encoded
+    return inputs
+
+def summarize(durations):
+    durations = np.asarray(durations) * 1000.0
+    return {
+        "n": int(durations.size),
+        "mean_ms": float(durations.mean()),
+        "p50_ms": float(np.percentile(durations, 50)),
+        "p95_ms": float(np.percentile(durations, 95)),
+        "p99_ms": float(np.percentile(durations, 99)),
+    }
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def center_box(gray):
+    height, width = gray.shape[:2]
+    side = min(height, width) // 2
+    return (width // 2 - side // 2, height // 2 - side // 2, side, side)
+
+def bench_stages(encoded_images, model, repeat):
+    stages = {name: [] for name in (
+        "decode_color", "grayscale_convert", "decode_grayscale",
+        "detect_full", "detect_fast", "crop_resize_normalize", "invoke",
+    )}
+    hits = 0
+    for _ in range(repeat):
+        for data in encoded_images:
+            buffer = np.frombuffer(data, np.uint8)
+            frame, duration = timed(cv2.imdecode, buffer, cv2.IMREAD_COLOR)
+            stages["decode_color"].append(duration)
+            _, duration = timed(cv2.cvtColor, frame, cv2.COLOR_BGR2GRAY)
+            stages["grayscale_convert"].append(duration)
+            gray, duration = timed(decode_grayscale, data)
+            stages["decode_grayscale"].append(duration)
+
+            faces, duration = timed(detect_faces_full, gray)
+            stages["detect_full"].append(duration)
+            _, duration = timed(detect_faces_fast, gray)
+            stages["detect_fast"].append(duration)
+            hits += len(faces) > 0
+
+            box = faces[0] if len(faces) else center_box(gray)
+            face, duration = timed(prepare_face, gray, box)
+            stages["crop_resize_normalize"].append(duration)
+            tensor = np.reshape(face, (1, 48, 48, 1)).astype(np.float32)
+            _, duration = timed(model.predict, tensor)
+            stages["invoke"].append(duration)
+
+    results = {name: summarize(durations) for name, durations in stages.items()}
+    results["face_hit_rate"] = hits / (repeat * len(encoded_images))
+    return results
+
+def bench_persistence(model, repeat):
+    """Bandingkan simpan per row (dua commit, perilaku lama) dengan bulk insert satu commit."""
+    Base.metadata.create_all(bind=engine)
+    probabilities = model.predict(np.zeros((1, 48, 48, 1), dtype=np.float32))
+    db = SessionLocal()
+    per_row, bulk = [], []
+    try:
+        for i in range(repeat):
+            started = time.perf_counter()
+            db_image = Image(UserID=1, ImagePath=f"images/user-faces/row-{i}.jpg")
+            db.add(db_image)
+            db.commit()
+            db.refresh(db_image)
+            analysis = ExpressionAnalysis(UserID=1, ImageID=db_image.ImageID, **analysis_scores(probabilities[0]))
+            db.add(analysis)
+            db.commit()
+            db.refresh(analysis)
+            per_row.append(time.perf_counter() - started)
+
+        # Bulk: 10 hasil per transaksi, waktu dibagi per hasil
+        for i in range(0, repeat, 10):
+            detections = [(1, f"images/user-faces/bulk-{i}-{j}.jpg", probabilities) for j in range(10)]
+            started = time.perf_counter()
+            save_detections(db, detections)
+            bulk.append((time.perf_counter() - started) / len(detections))
+    finally:
+        db.close()
+    return {"per_row_two_commits": summarize(per_row), "bulk_per_result": summarize(bulk)}
+
+async def bench_concurrency(encoded_images, requests_per_level):
+    """Throughput end-to-end (decode -> deteksi -> crop -> invoke via scheduler) per level concurrency."""
+    scheduler = InferenceScheduler(InterpreterPool())
+    loop = asyncio.get_running_loop()
+
+    def prepare(data):
+        gray = decode_grayscale(data)
+        faces = detect_faces_full(gray)
+        box = faces[0] if len(faces) else center_box(gray)
+        return np.reshape(prepare_face(gray, box), (1, 48, 48, 1)).astype(np.float32)
+
+    async def one_request(data, semaphore):
+        async with semaphore:
+            started = time.perf_counter()
+            tensor = await loop.run_in_executor(executor, prepare, data)
+            await scheduler.predict(tensor)
+            return time.perf_counter() - started
+
+    results = {}
+    for level in CONCURRENCY_LEVELS:
+        semaphore = asyncio.Semaphore(level)
+        payloads = [encoded_images[i % len(encoded_images)] for i in range(requests_per_level)]
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(one_request(data, semaphore) for data in payloads))
+        elapsed = time.perf_counter() - started
+        results[str(level)] = {"throughput_rps": requests_per_level / elapsed, **summarize(latencies)}
+    results["scheduler"] = scheduler.metrics()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Folder foto sampel (opsional)")
+    parser.add_argument("--repeat", type=int, default=5, help="Pengulangan per gambar untuk tahap tunggal")
+    parser.add_argument("--requests", type=int, default=64, help="Jumlah request per level concurrency")
+    parser.add_argument("--concurrency-resolution", default="1280x960", help="Resolusi untuk uji concurrency")
+    parser.add_argument("--output", default="bench_pipeline.json", help="File hasil JSON")
+    args = parser.parse_args()
+
+    inputs = build_inputs(args.images)
+    if args.concurrency_resolution not in inputs:
+        parser.error(f"--concurrency-resolution must be one of: {', '.join(inputs)}")
+    model = BatchInterpreter()
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "model_path": MODEL_PATH,
+            "source": args.images or "synthetic",
+        },
+        "stages": {},
+    }
+    for resolution, encoded_images in inputs.items():
+        results["stages"][resolution] = bench_stages(encoded_images, model, args.repeat)
+        print(f"== {resolution}")
+        for name, stats in results["stages"][resolution].items():
+            if isinstance(stats, dict):
+                print(f"  {name:<24}{stats['mean_ms']:>10.3f} ms  p95 {stats['p95_ms']:>9.3f} ms")
+
+    results["persistence"] = bench_persistence(model, max(args.repeat * 10, 20))
+    print("== persistence (sqlite)")
+    for name, stats in results["persistence"].items():
+        print(f"  {name:<24}{stats['mean_ms']:>10.3f} ms  p95 {stats['p95_ms']:>9.3f} ms")
+
+    results["concurrency"] = asyncio.run(bench_concurrency(inputs[args.concurrency_resolution], args.requests))
+    print(f"== concurrency ({args.concurrency_resolution})")
+    for level in CONCURRENCY_LEVELS:
+        stats = results["concurrency"][str(level)]
+        print(f"  {level:>3} concurrent  {stats['throughput_rps']:>8.1f} req/s  p95 {stats['p95_ms']:>9.3f} ms")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Ukur latency ranking rekomendasi (rank_songs) pada catalog sintetis berbagai ukuran.
+
+Jalankan dari root repo:
+
+    python -m benchmarks.recommendation --sizes 1000 10000 50000 --limit 20
+"""
+import argparse
+import time
+import numpy as np
+from API.recommendation import MOOD_CLASSIFICATIONS, EMOTIONS, classification_weights, rank_songs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--exclude", type=int, default=50, help="Jumlah lagu yang dikecualikan per request")
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        class_index = rng.integers(0, len(MOOD_CLASSIFICATIONS), size).astype(np.intp)
+        class_members = [np.flatnonzero(class_index == i).tolist() for i in range(len(MOOD_CLASSIFICATIONS))]
+        exclude = rng.choice(size, min(args.exclude, size), replace=False).tolist()
+
+        latencies = []
+        for i in range(args.repeat):
+            scores = rng.dirichlet(np.ones(len(EMOTIONS)))
+            started = time.perf_counter()
+            weights = classification_weights(scores)
+            rank_songs(weights, class_members, class_index, args.limit, np.random.default_rng(i), exclude)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+        print(
+            f"{size:>8} songs  p50 {np.percentile(latencies, 50):.3f} ms"
+            f"  p99 {np.percentile(latencies, 99):.3f} ms"
+        )
+
+if __name__ == "__main__":
+    main()
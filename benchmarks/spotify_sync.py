@@ -0,0 +1,97 @@
+"""Bandingkan sync metadata Spotify per track (perilaku lama) dengan multi-track paralel.
+
+Menjalankan server tiruan Spotify lokal (uvicorn) dengan latency buatan dan 429 acak,
+lalu mengarahkan SpotifyClient ke server itu. Jalankan dari root repo:
+
+    python -m benchmarks.spotify_sync --tracks 2000 --latency-ms 80 --rate-limit 0.02
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from APISpotify.spotify_client import SpotifyClient
+
+def fake_track(track_id):
+    return {
+        "id": track_id,
+        "name": f"Track {track_id}",
+        "album": {"name": "Album", "release_date": "2020-01-01", "images": [{"url": f"https://img/{track_id}"}]},
+        "artists": [{"name": "Artist"}],
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+        "duration_ms": 200000,
+    }
+
+def stand_in_app(latency, rate_limit):
+    app = FastAPI()
+
+    async def maybe_throttle():
+        await asyncio.sleep(latency)
+        if random.random() < rate_limit:
+            return JSONResponse({"error": "rate limited"}, status_code=429, headers={"Retry-After": "1"})
+        return None
+
+    @app.post("/api/token")
+    async def token():
+        return {"access_token": "bench", "token_type": "Bearer", "expires_in": 3600}
+
+    @app.get("/v1/tracks")
+    async def several_tracks(ids: str):
+        return await maybe_throttle() or {"tracks": [fake_track(track_id) for track_id in ids.split(",")]}
+
+    @app.get("/v1/tracks/{track_id}")
+    async def one_track(track_id: str):
+        return await maybe_throttle() or fake_track(track_id)
+
+    return app
+
+def start_server(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+async def run(base_url, track_ids, concurrency):
+    results = {}
+
+    client = SpotifyClient(api_url=f"{base_url}/v1", token_url=f"{base_url}/api/token", concurrency=1)
+    token = await client.get_token()
+    started = time.perf_counter()
+    for track_id in track_ids:
+        await client.get_track(token, track_id)
+    results["sequential_single"] = {"seconds": time.perf_counter() - started, **client.stats()}
+    await client.close()
+
+    client = SpotifyClient(api_url=f"{base_url}/v1", token_url=f"{base_url}/api/token", concurrency=concurrency)
+    started = time.perf_counter()
+    tracks = await client.fetch_tracks(token, track_ids)
+    results["batched_concurrent"] = {"seconds": time.perf_counter() - started, "tracks": len(tracks), **client.stats()}
+    await client.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Peluang respons 429 per request")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = start_server(stand_in_app(args.latency_ms / 1000.0, args.rate_limit), args.port)
+    try:
+        track_ids = [f"track{i:06d}" for i in range(args.tracks)]
+        results = asyncio.run(run(f"http://127.0.0.1:{args.port}", track_ids, args.concurrency))
+    finally:
+        server.should_exit = True
+
+    for name, stats in results.items():
+        print(f"{name:<20}{stats['seconds']:>9.2f} s  requests {stats['requests']:>6}  429 {stats['rate_limited']:>4}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Ukur waktu startup dan memori worker: import aplikasi, lalu load model (warm-up).
+
+Setiap skenario dijalankan di proses Python baru. Jalankan dari root repo (butuh .env):
+
+    python -m benchmarks.startup --runs 3
+
+Skenario "eager (tensorflow)" meniru perilaku lama: tensorflow penuh di-import dan
+tepat satu interpreter dibuat saat startup (INFERENCE_POOL_SIZE=1, bukan satu per core).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SCENARIOS = [
+    ("lazy import", {"MODEL_RUNTIME": "auto"}, False),
+    ("warm-up (auto runtime)", {"MODEL_RUNTIME": "auto"}, True),
+    ("eager (tensorflow)", {"MODEL_RUNTIME": "tensorflow", "INFERENCE_POOL_SIZE": "1"}, True),
+]
+
+PROBE = r"""
+import json, resource, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+runtime = None
+if sys.argv[1] == "1":
+    from API.inference import warm_up
+    runtime = warm_up()
+finished = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "warm_up_s": finished - imported,
+    "total_s": finished - started,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    "runtime": runtime,
+    "tensorflow_loaded": "tensorflow" in sys.modules,
+}))
+"""
+
+def run_probe(env_overrides, warm):
+    env = dict(os.environ, **env_overrides)
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE, "1" if warm else "0"],
+        env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else "probe failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Jumlah proses per skenario (diambil median)")
+    parser.add_argument("--json", help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'scenario':<26}{'import s':>10}{'warm-up s':>11}{'total s':>10}{'RSS MB':>10}  runtime")
+    for name, env_overrides, warm in SCENARIOS:
+        try:
+            samples = [run_probe(env_overrides, warm) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:<26}failed: {e}")
+            continue
+        samples.sort(key=lambda sample: sample["total_s"])
+        median = samples[len(samples) // 2]
+        results[name] = median
+        print(
+            f"{name:<26}{median['import_s']:>10.2f}{median['warm_up_s']:>11.2f}"
+            f"{median['total_s']:>10.2f}{median['max_rss_mb']:>10.1f}  {median['runtime'] or '-'}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
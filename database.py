@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.exc import DatabaseError
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
@@ -19,4 +20,29 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def create_missing_indexes():
+    """create_all tidak menambah index ke tabel yang sudah ada, jadi index baru dibuat di sini.
+
+    Dijalankan sebagai migrasi sekali jalan (python -m scripts.create_indexes), bukan saat startup:
+    membangun index pada tabel besar bisa lama. Mengembalikan nama index yang dibuat.
+    """
+    inspector = inspect(engine)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind=engine)
+            except DatabaseError as e:
+                # Proses lain sempat membuat index yang sama lebih dulu
+                if "already exists" not in str(e).lower() and "duplicate" not in str(e).lower():
+                    raise
+            else:
+                created.append(index.name)
+    return created
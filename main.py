@@ -1,12 +1,19 @@
 from fastapi import FastAPI
-from database import engine, Base
-from API import user_router, quote_router, music_dataset_router, image_router, expression_analysis_router
+from database import engine, Base, SessionLocal
+from API import user_router, quote_router, music_dataset_router, image_router, expression_analysis_router, live_emotion_router
 from APISpotify import track_router
 from fastapi import FastAPI
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.openapi.utils import get_openapi
 from fastapi.staticfiles import StaticFiles
 from API.detect import detect_router 
+from API.inference import warm_up
+from API.persistence import write_behind
+from API.music_catalog import music_catalog
+from API.quote_catalog import quote_catalog
+from APISpotify.spotify_client import spotify_client
+from APISpotify.sync_job import spotify_sync
+import os
 
 app = FastAPI()
 
@@ -45,7 +52,35 @@ app.include_router(image_router, tags=["Image"])
 app.include_router(expression_analysis_router, tags=["Expression Analysis"])
 app.include_router(track_router, tags=["Spotify"])
 app.include_router(detect_router, tags=["Emotion Detection"]) 
+app.include_router(live_emotion_router, tags=["Emotion Detection"])
 app.mount("/images", StaticFiles(directory="images/user-faces"), name="images")
 app.mount("/images", StaticFiles(directory="images/avatars"))
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+Base.metadata.create_all(bind=engine)
+
+# Muat model TFLite saat startup (MODEL_WARMUP=1) agar request pertama tidak menanggung biaya load
+@app.on_event("startup")
+def warm_up_model():
+    if os.getenv("MODEL_WARMUP", "0") == "1":
+        warm_up()
+
+# Bangun catalog musik dan quote in-memory sekali saat startup
+@app.on_event("startup")
+def load_catalogs():
+    db = SessionLocal()
+    try:
+        music_catalog.load(db)
+        quote_catalog.load(db)
+    finally:
+        db.close()
+
+# Simpan semua hasil deteksi yang masih di antrean write-behind sebelum proses berhenti
+@app.on_event("shutdown")
+def drain_write_behind():
+    write_behind.stop()
+
+# Hentikan sync Spotify di batas chunk (bisa dilanjutkan lewat /update-song/resume), lalu tutup connection pool
+@app.on_event("shutdown")
+async def close_spotify_client():
+    await spotify_sync.stop()
+    await spotify_client.close()
@@ -3,3 +3,6 @@ from .quote import Quote
 from .music_dataset import MusicDataset
 from .image import Image
 from .expression_analysis import ExpressionAnalysis
+from .mood_count import UserMoodCount
+from .mood_rollup import MoodRollup
+from .sync_job import SpotifySyncJob
@@ -1,10 +1,14 @@
-from sqlalchemy import Boolean, Column, Integer, String, Float, Date, Enum, ForeignKey, TIMESTAMP
+from sqlalchemy import Boolean, Column, Integer, String, Float, Date, Enum, ForeignKey, TIMESTAMP, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
 
 class ExpressionAnalysis(Base):
     __tablename__ = "expression_analysis"
+    # Index komposit untuk riwayat per user terurut waktu (keyset pagination)
+    __table_args__ = (
+        Index("ix_expression_analysis_user_created", "UserID", "CreatedAt", "AnalysisID"),
+    )
     AnalysisID = Column(Integer, primary_key=True, autoincrement=True)
     UserID = Column(Integer, ForeignKey("users.UserID"))
     ImageID = Column(Integer, ForeignKey("images.ImageID"))
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, ForeignKey, TIMESTAMP
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from database import Base
+
+class UserMoodCount(Base):
+    __tablename__ = "user_mood_counts"
+    UserID = Column(Integer, ForeignKey("users.UserID"), primary_key=True)
+    HappyCount = Column(Integer, default=0, nullable=False)
+    SadCount = Column(Integer, default=0, nullable=False)
+    FearCount = Column(Integer, default=0, nullable=False)
+    DisgustCount = Column(Integer, default=0, nullable=False)
+    AngryCount = Column(Integer, default=0, nullable=False)
+    SurpriseCount = Column(Integer, default=0, nullable=False)
+    NeutralCount = Column(Integer, default=0, nullable=False)
+    UpdatedAt = Column(TIMESTAMP, default=func.now(), onupdate=func.now(), nullable=False)
+
+    user = relationship("User", back_populates="mood_counts")
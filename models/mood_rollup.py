@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Float, Date, Enum, ForeignKey
+from sqlalchemy.orm import relationship
+from database import Base
+
+class MoodRollup(Base):
+    __tablename__ = "mood_rollups"
+    UserID = Column(Integer, ForeignKey("users.UserID"), primary_key=True)
+    Period = Column(Enum('day', 'week'), primary_key=True)
+    BucketStart = Column(Date, primary_key=True)  # Tanggal (day) atau hari Senin (week)
+    AnalysisCount = Column(Integer, default=0, nullable=False)
+    # Jumlah skor per kolom; rata-rata = ScoreSum / AnalysisCount
+    SadScoreSum = Column(Float, default=0, nullable=False)
+    AngryScoreSum = Column(Float, default=0, nullable=False)
+    HappyScoreSum = Column(Float, default=0, nullable=False)
+    DisgustScoreSum = Column(Float, default=0, nullable=False)
+    FearScoreSum = Column(Float, default=0, nullable=False)
+    SurpriseScoreSum = Column(Float, default=0, nullable=False)
+    NeutralScoreSum = Column(Float, default=0, nullable=False)
+    # Jumlah analisis per MoodDetected (mood dominan)
+    HappyCount = Column(Integer, default=0, nullable=False)
+    SadCount = Column(Integer, default=0, nullable=False)
+    FearCount = Column(Integer, default=0, nullable=False)
+    DisgustCount = Column(Integer, default=0, nullable=False)
+    AngryCount = Column(Integer, default=0, nullable=False)
+    SurpriseCount = Column(Integer, default=0, nullable=False)
+    NeutralCount = Column(Integer, default=0, nullable=False)
+
+    user = relationship("User", back_populates="mood_rollups")
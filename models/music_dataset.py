@@ -1,10 +1,14 @@
-from sqlalchemy import Boolean, Column, Integer, String, Float, Date, Enum, ForeignKey, TIMESTAMP
+from sqlalchemy import Boolean, Column, Integer, String, Float, Date, Enum, ForeignKey, TIMESTAMP, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
 
 class MusicDataset(Base):
     __tablename__ = "music_dataset"
+    # MAX(UpdatedAt) adalah bagian signature catalog yang dicek setiap kali catalog ditulis
+    __table_args__ = (
+        Index("ix_music_dataset_updated", "UpdatedAt"),
+    )
     MusicID = Column(Integer, primary_key=True, autoincrement=True)
     MusicTitle = Column(String(255))
     MusicAlbum = Column(String(255))
@@ -0,0 +1,19 @@
+from sqlalchemy import Boolean, Column, Integer, String, Text, TIMESTAMP
+from sqlalchemy.sql import func
+from database import Base
+
+class SpotifySyncJob(Base):
+    __tablename__ = "spotify_sync_jobs"
+    JobID = Column(Integer, primary_key=True, autoincrement=True)
+    Status = Column(String(20), nullable=False, default="running")  # running, cancel_requested, completed, cancelled, failed
+    FullRefresh = Column(Boolean, nullable=False, default=False)  # True: semua lagu ber-SpotifyID, bukan hanya yang tanpa SongUrl
+    LastMusicID = Column(Integer, nullable=False, default=0)  # Checkpoint: MusicID terakhir yang sudah di-commit
+    Total = Column(Integer, nullable=False, default=0)
+    Processed = Column(Integer, nullable=False, default=0)
+    Updated = Column(Integer, nullable=False, default=0)
+    Removed = Column(Integer, nullable=False, default=0)
+    Unchanged = Column(Integer, nullable=False, default=0)
+    Error = Column(Text)
+    StartedAt = Column(TIMESTAMP, default=func.now(), nullable=False)
+    UpdatedAt = Column(TIMESTAMP, default=func.now(), onupdate=func.now(), nullable=False)
+    FinishedAt = Column(TIMESTAMP)
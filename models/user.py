@@ -17,4 +17,6 @@ class User(Base):
     updatedAt = Column(TIMESTAMP, default=func.now(), onupdate=func.now(), nullable=False)
 
     images = relationship("Image", back_populates="user", cascade="all, delete-orphan")
-    analyses = relationship("ExpressionAnalysis", back_populates="user", cascade="all, delete-orphan")
\ No newline at end of file
+    analyses = relationship("ExpressionAnalysis", back_populates="user", cascade="all, delete-orphan")
+    mood_counts = relationship("UserMoodCount", back_populates="user", uselist=False, cascade="all, delete-orphan")
+    mood_rollups = relationship("MoodRollup", back_populates="user", cascade="all, delete-orphan")
\ No newline at end of file
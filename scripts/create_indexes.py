@@ -0,0 +1,21 @@
+"""Buat index yang ada di model tetapi belum ada di tabel yang sudah terisi (migrasi sekali jalan).
+
+Base.metadata.create_all hanya membuat index untuk tabel baru. Jalankan sekali saat deploy,
+sebelum worker dinyalakan, dari root repo:
+
+    python -m scripts.create_indexes
+"""
+import argparse
+from database import create_missing_indexes
+import models  # noqa: F401  (mendaftarkan semua tabel ke Base.metadata)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+    created = create_missing_indexes()
+    for name in created:
+        print(f"created index {name}")
+    print(f"{len(created)} indexes created")
+
+if __name__ == "__main__":
+    main()
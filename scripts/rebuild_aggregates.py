@@ -0,0 +1,129 @@
+"""Hitung ulang agregat dari expression_analysis: counter mood per user (user_mood_counts)
+dan rollup tren per hari/minggu (mood_rollups).
+
+Wajib dijalankan sekali saat deploy fitur agregat: increment_rollup hanya mengisi bucket
+yang menerima analisis baru, jadi bucket hari/minggu dari sebelum deploy hanya terisi lewat
+script ini. Counter mood di-seed saat dibutuhkan, tetapi script ini juga memverifikasinya.
+
+Jalankan dari root repo:
+
+    python -m scripts.rebuild_aggregates          # hitung ulang lalu verifikasi
+    python -m scripts.rebuild_aggregates --check  # hanya verifikasi, tanpa menulis
+"""
+import argparse
+import math
+import sys
+from collections import defaultdict
+from sqlalchemy import func
+from database import Base, engine, SessionLocal
+from models import ExpressionAnalysis, UserMoodCount, MoodRollup, User
+from API.aggregates import (
+    MOOD_COUNT_COLUMNS, ROLLUP_PERIODS, ANALYSIS_FIELDS,
+    add_to_rollup, bucket_start, empty_rollup_values, mood_counts_to_dict,
+)
+
+def live_counts(db):
+    """Counter dari GROUP BY atas seluruh expression_analysis: {user_id: {mood: total}}."""
+    counts = {}
+    rows = db.query(ExpressionAnalysis.UserID, ExpressionAnalysis.MoodDetected, func.count()) \
+        .filter(ExpressionAnalysis.UserID.isnot(None)) \
+        .group_by(ExpressionAnalysis.UserID, ExpressionAnalysis.MoodDetected).all()
+    for user_id, mood, total in rows:
+        if mood in MOOD_COUNT_COLUMNS:
+            counts.setdefault(user_id, {})[mood] = total
+    return counts
+
+def rebuild_mood_counts(db):
+    counts = live_counts(db)
+    db.query(UserMoodCount).delete(synchronize_session=False)
+    user_ids = {user_id for (user_id,) in db.query(User.UserID).all()}
+    db.add_all([
+        UserMoodCount(
+            UserID=user_id,
+            **{column: counts.get(user_id, {}).get(mood, 0) for mood, column in MOOD_COUNT_COLUMNS.items()}
+        )
+        for user_id in user_ids
+    ])
+    db.commit()
+    return len(user_ids)
+
+def check_mood_counts(db):
+    """Bandingkan counter tersimpan dengan GROUP BY. Mengembalikan daftar user yang tidak cocok."""
+    counts = live_counts(db)
+    counters = {counter.UserID: counter for counter in db.query(UserMoodCount).all()}
+    mismatches = []
+    for user_id in set(counts) | set(counters):
+        expected = {mood: counts.get(user_id, {}).get(mood, 0) for mood in MOOD_COUNT_COLUMNS}
+        stored = mood_counts_to_dict(counters.get(user_id))
+        stored.pop("Total")
+        # User tanpa row counter dianggap cocok jika belum punya riwayat (row dibuat saat dibutuhkan)
+        if user_id not in counters and not any(expected.values()):
+            continue
+        if expected != stored:
+            mismatches.append((user_id, expected, stored))
+    return mismatches
+
+def live_rollups(db):
+    """Rollup dari seluruh row mentah, dibaca bertahap: {(user_id, period, bucket): values}."""
+    rollups = defaultdict(empty_rollup_values)
+    columns = [getattr(ExpressionAnalysis, field) for field in ANALYSIS_FIELDS]
+    query = db.query(*columns).filter(ExpressionAnalysis.UserID.isnot(None)).yield_per(1000)
+    for row in query:
+        analysis = dict(zip(ANALYSIS_FIELDS, row))
+        for period in ROLLUP_PERIODS:
+            add_to_rollup(rollups[(analysis["UserID"], period, bucket_start(analysis["CreatedAt"], period))], analysis)
+    return rollups
+
+def rebuild_mood_rollups(db):
+    rollups = live_rollups(db)
+    db.query(MoodRollup).delete(synchronize_session=False)
+    db.add_all([
+        MoodRollup(UserID=user_id, Period=period, BucketStart=start, **values)
+        for (user_id, period, start), values in rollups.items()
+    ])
+    db.commit()
+    return len(rollups)
+
+def check_mood_rollups(db):
+    """Bandingkan bucket rollup tersimpan dengan hasil hitung ulang. Mengembalikan bucket yang tidak cocok."""
+    expected = live_rollups(db)
+    stored = {
+        (rollup.UserID, rollup.Period, rollup.BucketStart): {key: getattr(rollup, key) for key in empty_rollup_values()}
+        for rollup in db.query(MoodRollup).all()
+    }
+    mismatches = []
+    for key in set(expected) | set(stored):
+        want = expected.get(key, empty_rollup_values())
+        have = stored.get(key, empty_rollup_values())
+        if any(not math.isclose(want[column], have[column] or 0, rel_tol=1e-6, abs_tol=1e-6) for column in want):
+            mismatches.append((key, want, have))
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="Hanya verifikasi, tanpa menulis")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if not args.check:
+            rebuilt = rebuild_mood_counts(db)
+            print(f"mood counts rebuilt for {rebuilt} users")
+            rebuilt = rebuild_mood_rollups(db)
+            print(f"mood rollups rebuilt: {rebuilt} buckets")
+        count_mismatches = check_mood_counts(db)
+        rollup_mismatches = check_mood_rollups(db)
+    finally:
+        db.close()
+
+    for user_id, expected, stored in count_mismatches:
+        print(f"user {user_id}: expected {expected}, stored {stored}")
+    print(f"mood counts: {len(count_mismatches)} mismatched users")
+    for (user_id, period, start), expected, stored in rollup_mismatches:
+        print(f"user {user_id} {period} {start}: expected {expected}, stored {stored}")
+    print(f"mood rollups: {len(rollup_mismatches)} mismatched buckets")
+    return 1 if count_mismatches or rollup_mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())